@@ -0,0 +1,135 @@
+import math
+import warnings
+import numpy as np
+import pandas as pd
+import storage
+import codec
+
+EFFECT_METRICS = ["daily_sm_min", "sleep", "life_satisfaction"]
+
+
+def load_frames(conn):
+    # one query per table, everything else is columnar work on the frames;
+    # pandas only knows sqlite3 natively, psycopg works through its generic DBAPI path
+    conn = getattr(conn, "raw", conn)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        return {
+            "participants": pd.read_sql_query("SELECT id AS participant_id, progress FROM participants", conn),
+            "logs": pd.read_sql_query(
+                'SELECT participant_id, date, duration, apps, reasons, emotion_before, emotion_after FROM logs', conn),
+            "pretest": pd.read_sql_query(
+                "SELECT participant_id, " + storage._cols(storage.PRETEST_FIELDS) + " FROM pretest", conn),
+            "posttest": pd.read_sql_query(
+                "SELECT participant_id, " + storage._cols(storage.POSTTEST_FIELDS) + " FROM posttest", conn),
+        }
+
+
+def _betainc(a, b, x):
+    # regularized incomplete beta via Lentz's continued fraction (Numerical Recipes 6.4)
+    if x <= 0.0 or x >= 1.0:
+        return 0.0 if x <= 0.0 else 1.0
+    if x > (a + 1.0) / (a + b + 2.0):
+        return 1.0 - _betainc(b, a, 1.0 - x)
+    lbeta = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x)
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    f = d
+    for m in range(1, 300):
+        for num in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                    -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + num * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + num / c
+            c = c if abs(c) > tiny else tiny
+            f *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return math.exp(lbeta) * f / a
+
+
+def t_pvalue(t, df):
+    if not np.isfinite(t) or df <= 0:
+        return float("nan")
+    return _betainc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def paired_effects(pretest, posttest, metrics=EFFECT_METRICS):
+    both = pretest[["participant_id"] + metrics].merge(
+        posttest[["participant_id"] + metrics], on="participant_id", suffixes=("_pre", "_post"))
+    pre = both[[m + "_pre" for m in metrics]].to_numpy(dtype=float)
+    post = both[[m + "_post" for m in metrics]].to_numpy(dtype=float)
+    diff = post - pre
+    valid = ~np.isnan(diff)
+    n = valid.sum(axis=0)
+    # metrics with fewer than two pairs come out as NaN rather than warning
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean_pre = np.nanmean(np.where(valid, pre, np.nan), axis=0)
+        mean_post = np.nanmean(np.where(valid, post, np.nan), axis=0)
+        mean_diff = np.nanmean(diff, axis=0)
+        sd_diff = np.nanstd(diff, axis=0, ddof=1)
+        t = mean_diff / (sd_diff / np.sqrt(n))
+        d = mean_diff / sd_diff
+    out = pd.DataFrame({
+        "metric": metrics,
+        "n": n,
+        "mean_pre": mean_pre,
+        "mean_post": mean_post,
+        "mean_change": mean_diff,
+        "sd_change": sd_diff,
+        "t": t,
+        "cohens_d": d,
+    })
+    out["p"] = [t_pvalue(ti, ni - 1) for ti, ni in zip(t, n)]
+    return out
+
+
+def _explode_list(series):
+    # log lists are stored as JSON text; there are few distinct combinations,
+    # so parse each once and broadcast back through the factor codes
+    codes, uniques = pd.factorize(series.fillna("").astype(str))
+    parsed = np.empty(len(uniques), dtype=object)
+    parsed[:] = [codec.parse_list(u) for u in uniques]
+    return pd.Series(parsed[codes], index=series.index).explode().dropna()
+
+
+def platform_usage(logs):
+    apps = _explode_list(logs["apps"])
+    if apps.empty:
+        return pd.DataFrame(columns=["platform", "logs", "participants", "mean_duration"])
+    joined = logs[["participant_id", "duration"]].loc[apps.index].assign(platform=apps.to_numpy())
+    out = joined.groupby("platform").agg(logs=("duration", "size"), participants=("participant_id", "nunique"),
+                                         mean_duration=("duration", "mean"))
+    return out.sort_values("logs", ascending=False).reset_index()
+
+
+def frequencies(series):
+    counts = series[series.astype(bool)].value_counts()
+    return counts.rename_axis("value").reset_index(name="count")
+
+
+def reason_frequencies(logs):
+    return frequencies(_explode_list(logs["reasons"]))
+
+
+def emotion_frequencies(logs):
+    return {"before": frequencies(logs["emotion_before"].dropna()),
+            "after": frequencies(logs["emotion_after"].dropna())}
+
+
+def usage_trend(logs):
+    return logs.groupby("date")["duration"].agg(["mean", "median", "count"]).reset_index()
+
+
+def cohort_report(conn):
+    f = load_frames(conn)
+    return {
+        "participants": len(f["participants"]),
+        "effects": paired_effects(f["pretest"], f["posttest"]),
+        "platforms": platform_usage(f["logs"]),
+        "reasons": reason_frequencies(f["logs"]),
+        "emotions": emotion_frequencies(f["logs"]),
+        "trend": usage_trend(f["logs"]),
+    }
@@ -0,0 +1,195 @@
+import argparse
+import math
+from datetime import date, datetime, timedelta
+import storage
+
+# Relapse-risk detection over incoming logs. Each participant has one
+# participant_stats row of running state that every new log updates in place
+# (called from storage.submit/add_logs, inside the save's transaction), so a save
+# costs the same whether the participant has 3 logs or 3000. Flags go to
+# relapse_flags, at most one per participant, kind and day:
+#   spike     a log far above the participant's EWMA of duration
+#   over_goal STREAK_DAYS logged days in a row above pretest.goal_time
+#   gap       logging resumed after GAP_DAYS or more days without a log
+# Logs dated before the participant's latest day only move the EWMA.
+
+ALPHA = 0.3
+MIN_LOGS = 5
+SPIKE_SIGMA = 2.5
+SPIKE_MIN_MINUTES = 30
+STREAK_DAYS = 3
+GAP_DAYS = 3
+RECENT_DAYS = 14
+CHUNK_ROWS = 10000
+KINDS = ["spike", "over_goal", "gap"]
+
+STATS_FIELDS = ["log_count", "ewma", "ewm_var", "last_date", "day_total", "streak", "max_streak",
+                "last_gap", "max_gap", "gaps"]
+FLAG_FIELDS = ["participant_id", "kind", "date", "value", "baseline", "created_at"]
+EMPTY = {**dict.fromkeys(STATS_FIELDS, 0), "ewma": None, "ewm_var": 0.0, "last_date": None}
+
+
+def _days(a, b):
+    return (date.fromisoformat(b) - date.fromisoformat(a)).days
+
+
+def step(s, log, goal, uid=None):
+    # advance state s (a dict, updated in place) by one log; returns the flags it raised
+    flags = []
+    d, x = log["date"], log.get("duration")
+    if x is not None:
+        if s["ewma"] is None:
+            s["ewma"], s["ewm_var"] = float(x), 0.0
+        else:
+            diff = x - s["ewma"]
+            late = s["last_date"] is not None and d < s["last_date"]
+            if not late and s["log_count"] >= MIN_LOGS and diff > max(SPIKE_SIGMA * math.sqrt(s["ewm_var"]),
+                                                                       SPIKE_MIN_MINUTES):
+                flags.append((uid, "spike", d, x, round(s["ewma"], 1)))
+            # exponentially weighted mean and variance
+            incr = ALPHA * diff
+            s["ewma"] += incr
+            s["ewm_var"] = (1 - ALPHA) * (s["ewm_var"] + diff * incr)
+    s["log_count"] += 1
+    if s["last_date"] is None:
+        s["last_date"], s["day_total"] = d, x or 0
+    elif d > s["last_date"]:
+        # close the previous day; a day without a log ends the streak
+        gap = _days(s["last_date"], d)
+        above = goal is not None and s["day_total"] > goal
+        s["streak"] = s["streak"] + 1 if gap == 1 and above else 0
+        s["last_gap"] = gap - 1
+        if gap > 1:
+            s["gaps"] += 1
+            s["max_gap"] = max(s["max_gap"], gap - 1)
+            if gap - 1 >= GAP_DAYS:
+                flags.append((uid, "gap", d, gap - 1, None))
+        s["last_date"], s["day_total"] = d, x or 0
+    elif d == s["last_date"]:
+        s["day_total"] += x or 0
+    else:
+        return flags
+    # the streak including today, once today's total is over the goal
+    if goal is not None and s["day_total"] > goal:
+        current = s["streak"] + 1
+        s["max_streak"] = max(s["max_streak"], current)
+        if current == STREAK_DAYS:
+            flags.append((uid, "over_goal", d, current, goal))
+    return flags
+
+
+# ── STORE ─────────────────────────────────────────────
+
+def _load(conn, uid):
+    row = conn.execute(
+        "SELECT (SELECT goal_time FROM pretest WHERE participant_id=?), " + ", ".join(STATS_FIELDS)
+        + " FROM participants p LEFT JOIN participant_stats s ON s.participant_id=p.id WHERE p.id=?",
+        (uid, uid)).fetchone()
+    if row is None or row[1] is None:
+        return (row[0] if row else None), dict(EMPTY)
+    return row[0], dict(zip(STATS_FIELDS, row[1:]))
+
+
+def _save(conn, uid, s, flags, now):
+    conn.execute(
+        "INSERT INTO participant_stats (participant_id, " + ", ".join(STATS_FIELDS) + ", updated_at) VALUES (?"
+        + ", ?" * (len(STATS_FIELDS) + 1) + ") ON CONFLICT (participant_id) DO UPDATE SET "
+        + ", ".join(f + "=excluded." + f for f in STATS_FIELDS + ["updated_at"]),
+        [uid] + [s[f] for f in STATS_FIELDS] + [now])
+    if flags:
+        conn.executemany(
+            "INSERT INTO relapse_flags (" + ", ".join(FLAG_FIELDS) + ") VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (participant_id, kind, date) DO NOTHING", [list(f) + [now] for f in flags])
+
+
+def observe(conn, uid, logs):
+    # inside the caller's transaction, after the participant row exists
+    if not logs:
+        return []
+    goal, s = _load(conn, uid)
+    flags = []
+    for log in logs:
+        flags += step(s, log, goal, uid)
+    _save(conn, uid, s, flags, datetime.now().isoformat(timespec="seconds"))
+    return flags
+
+
+def rebuild(conn):
+    # one-off seed for logs saved before participant_stats existed: one ordered pass
+    # over logs, one participant's state in memory at a time
+    now = datetime.now().isoformat(timespec="seconds")
+    goals = dict(conn.execute("SELECT participant_id, goal_time FROM pretest").fetchall())
+    n = 0
+    with conn:
+        conn.execute("DELETE FROM participant_stats")
+        conn.execute("DELETE FROM relapse_flags")
+        cur = storage.stream(conn, "SELECT participant_id, date, duration FROM logs ORDER BY participant_id, date, id")
+        uid, s, flags = None, None, []
+        while True:
+            rows = cur.fetchmany(CHUNK_ROWS)
+            for pid, d, x in rows:
+                if pid != uid:
+                    if uid is not None:
+                        _save(conn, uid, s, flags, now)
+                        n += 1
+                    uid, s, flags = pid, dict(EMPTY), []
+                flags += step(s, {"date": d, "duration": x}, goals.get(pid), pid)
+            if not rows:
+                cur.close()
+                break
+        if uid is not None:
+            _save(conn, uid, s, flags, now)
+            n += 1
+        conn.execute("INSERT INTO meta (key, value) VALUES ('stats_built', ?) "
+                     "ON CONFLICT (key) DO UPDATE SET value=excluded.value", (now,))
+    return n
+
+
+# ── QUERY ─────────────────────────────────────────────
+
+def stats(conn, uid):
+    row = conn.execute("SELECT " + ", ".join(STATS_FIELDS) + " FROM participant_stats WHERE participant_id=?",
+                       (uid,)).fetchone()
+    return dict(zip(STATS_FIELDS, row)) if row else None
+
+
+def flags(conn, since=None, kind=None, uid=None, limit=500):
+    # newest first, from the relapse_flags_date index
+    where, params = ["date>=?"], [since or (date.today() - timedelta(days=RECENT_DAYS)).isoformat()]
+    if kind:
+        where.append("kind=?")
+        params.append(kind)
+    if uid:
+        where.append("participant_id=?")
+        params.append(uid)
+    cur = conn.execute("SELECT " + ", ".join(FLAG_FIELDS) + " FROM relapse_flags WHERE " + " AND ".join(where)
+                       + " ORDER BY date DESC, id DESC LIMIT ?", params + [limit])
+    return [dict(zip(FLAG_FIELDS, r)) for r in cur]
+
+
+def at_risk(conn, since=None, limit=100):
+    # participants with recent flags, most flagged first
+    since = since or (date.today() - timedelta(days=RECENT_DAYS)).isoformat()
+    return conn.execute(
+        "SELECT f.participant_id, COUNT(*), MAX(f.date), s.ewma, s.streak, s.last_date FROM relapse_flags f "
+        "LEFT JOIN participant_stats s ON s.participant_id=f.participant_id WHERE f.date>=? "
+        "GROUP BY f.participant_id, s.ewma, s.streak, s.last_date ORDER BY COUNT(*) DESC, MAX(f.date) DESC LIMIT ?",
+        (since, limit)).fetchall()
+
+
+if __name__ == "__main__":
+    import repository
+    ap = argparse.ArgumentParser(description="Relapse-risk flags from the incremental usage statistics.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    show = sub.add_parser("flags", help="list recent flags")
+    show.add_argument("--since", default=None, help="ISO date (default: last %d days)" % RECENT_DAYS)
+    show.add_argument("--kind", choices=KINDS, default=None)
+    show.add_argument("--participant", default=None)
+    sub.add_parser("rebuild", help="recompute participant_stats and relapse_flags from all logs")
+    args = ap.parse_args()
+    repo = repository.get()
+    if args.cmd == "rebuild":
+        print("%d participants" % repo.write(rebuild))
+    else:
+        for f in flags(repo.reader(), args.since, args.kind, args.participant):
+            print(f["date"], f["participant_id"], f["kind"], f["value"], f["baseline"])
@@ -1,235 +1,267 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
-import plotly.express as px
-import json
-import smtplib
+import storage
+import cache
+import outbox
+import repository
+import logviewer
+import drafts
+import charts
+import eventlog
+import instrument
+import content
 from datetime import date
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
-def get_db():
-    conn = sqlite3.connect('users.db', check_same_thread=False)
-    conn.execute("CREATE TABLE IF NOT EXISTS t (id TEXT PRIMARY KEY, data TEXT)")
-    return conn
-
-conn = get_db()
+# initial values of the Day 1-3 widgets ("<form>.<field>" keys), restored from drafts when saved
+DAY1_FORM = {"pre_screen": 120, "pre_distract": 10, "pre_sleep": 5, "pre_life": 5, "pre_focus": "Never",
+             "pre_cope": "", "pre_spare": 120, "pre_goal": 60, "apps": [], "duration": 120, "reasons": [],
+             "trigger": "", "emotion_before": "Bored", "emotion_after": "Relaxed", "consequences": [],
+             "trigger_when": "", "trigger_why": "", "trigger_felt": ""}
+DAY2_FORM = {"if_trigger": "", "then_action": "", "expect": "", "after10": "",
+             "t1": False, "t2": False, "t3": False, "t4": False, "t5": False, "t6": False,
+             "duration2": 90, "trigger2": "", "what_helped": ""}
+DAY3_FORM = {"what_changed": "", "what_worked": "", "what_hardest": "", "rules": "", "warning_signs": "",
+             "recovery_plan": "", "support": "", "post_screen": 60, "post_distract": 5, "post_sleep": 7,
+             "post_life": 7, "post_focus": "Never", "post_cope": "", "more_time": "No"}
 
 def load(uid):
-    c = conn.cursor()
-    c.execute("SELECT data FROM t WHERE id=?", (uid,))
-    row = c.fetchone()
-    return json.loads(row[0]) if row else {"progress": 0, "logs": [], "pretest": {}, "day2_logs": [], "day3": {}}
+    with instrument.span("load"):
+        return cache.participants.get(uid)
+
+def save(uid, progress, **sections):
+    with instrument.span("save"):
+        return cache.participants.submit(uid, progress, **sections)
+
+@st.cache_resource
+def get_watcher():
+    return cache.participants.watch()
 
-def save(uid, d):
-    conn.execute("REPLACE INTO t VALUES (?, ?)", (uid, json.dumps(d)))
-    conn.commit()
+@st.cache_resource
+def get_compactor():
+    return eventlog.Compactor().start()
+
+@st.cache_resource
+def get_outbox_worker():
+    return outbox.OutboxWorker(outbox.SMTPSender(**outbox.config_from_secrets(st.secrets))).start()
 
 def send_email(user_id, data):
     try:
-        sender = st.secrets["EMAIL_ADDRESS"]
-        password = st.secrets["EMAIL_PASSWORD"]
-        receiver = st.secrets["RECEIVER_EMAIL"]
-        logs_df = pd.DataFrame(data["logs"]) if data["logs"] else pd.DataFrame()
-        body = "SMU Training Report\n====================\n"
-        body += "Participant: " + user_id + "\n"
-        body += "Days Completed: " + str(data["progress"]) + "\n\n"
-        if data.get("pretest"):
-            body += "PRE-TEST ANSWERS:\n"
-            for k, v in data["pretest"].items():
-                body += k + ": " + str(v) + "\n"
-            body += "\n"
-        body += "USAGE LOGS:\n"
-        body += logs_df.to_string() if not logs_df.empty else "No logs"
-        if data.get("day3"):
-            body += "\n\nDAY 3 PERSONAL RULES:\n" + str(data["day3"].get("rules", ""))
-            body += "\nWARNING SIGNS: " + str(data["day3"].get("warning_signs", ""))
-            body += "\nRECOVERY PLAN: " + str(data["day3"].get("recovery_plan", ""))
-        msg = MIMEMultipart()
-        msg["From"] = sender
-        msg["To"] = receiver
-        msg["Subject"] = "SMU Report - " + user_id
-        msg.attach(MIMEText(body, "plain"))
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(sender, password)
-            server.send_message(msg)
-        return True
+        with instrument.span("send_email"):
+            receiver = st.secrets["RECEIVER_EMAIL"]
+            worker = get_outbox_worker()
+            message_id = outbox.enqueue_report(user_id, data, receiver)
+            worker.notify()
+        return message_id
     except Exception as e:
         st.error(str(e))
-        return False
-
+        return None
+
+@st.fragment(run_every=2)
+def report_status(message_id):
+    # polls only while the message is pending; a final status ends polling with one full rerun
+    s = outbox.status(message_id)
+    if s is None or s["status"] in ("sent", "failed"):
+        st.session_state.pop("report_id", None)
+        st.session_state["report_result"] = s
+        st.rerun()
+    st.info("Report queued (" + s["status"] + ", attempt " + str(s["attempts"] + 1) + ")")
+
+def report_result(s):
+    if s["status"] == "sent":
+        st.success("Report sent!")
+    else:
+        st.error("Report could not be sent: " + str(s["last_error"]))
+
+@st.fragment
+def full_log(user_id):
+    # one page per rerun, keyed on (date, id); paging reruns only this fragment
+    conn = repository.get().reader()
+    c1, c2, c3, c4 = st.columns(4)
+    dates = c1.date_input("Dates", value=(), key="log_dates")
+    platform = c2.selectbox("Platform", [None] + logviewer.PLATFORMS, format_func=lambda v: v or "All",
+                            key="log_platform")
+    trigger = c3.selectbox("Trigger", [None] + logviewer.triggers(conn, user_id, cache.participants.version(user_id)),
+                           format_func=lambda v: v or "All", key="log_trigger")
+    text = c4.text_input("Search triggers", key="log_text")
+    filters = {"start": dates[0].isoformat() if dates else None,
+               "end": dates[-1].isoformat() if len(dates) == 2 else None,
+               "platform": platform, "trigger": trigger, "text": text}
+    state = st.session_state.setdefault("log_pages", {"query": None, "keys": [None]})
+    if state["query"] != (user_id, filters):
+        state.update(query=(user_id, filters), keys=[None])
+    with instrument.span("logviewer.page"):
+        logs, more = logviewer.page(conn, user_id, filters, state["keys"][-1])
+    rows = [{f: ", ".join(v) if isinstance(v, list) else v for f, v in log.items() if f != "id"} for log in logs]
+    with instrument.span("dataframe.full_log"):
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    prev, label, nxt = st.columns([1, 2, 1])
+    label.caption("Page " + str(len(state["keys"])) + ("" if logs else " — no matching logs"))
+    prev.button("← Newer", disabled=len(state["keys"]) == 1, on_click=state["keys"].pop)
+    nxt.button("Older →", disabled=more is None, on_click=state["keys"].append, args=(more,))
+    st.download_button("Download CSV", lambda: logviewer.csv_text(repository.get().reader(), user_id, filters),
+                       "smu_data.csv")
+
+rerun = instrument.rerun("app")
+instrument.serve_prometheus()
 st.set_page_config(page_title="SMU Training", layout="wide")
 
-COURSE_NAME = "Applications of Psychology in Society (Work, Health and Education)"
-MODULE_NAME = "Application of Psychology in Society - Work C"
-AFFILIATION = "Leuphana university"
-FACILITATORS = [
-    "Anna Redvanska",
-    "Ezzat Bachour",
-    "Maja Gabriel-Węglowska",
-    "Karolina Kozłowska"
-]
-
 st.sidebar.title("SMU Training Program")
 st.sidebar.caption("14-day evidence-based digital wellness program")
 st.sidebar.markdown("---")
-st.sidebar.markdown(f"**Course:**<br>{COURSE_NAME}", unsafe_allow_html=True)
-st.sidebar.markdown("**Facilitators:**<br>" + "<br>".join(FACILITATORS), unsafe_allow_html=True)
+st.sidebar.markdown(content.SIDEBAR_COURSE, unsafe_allow_html=True)
+st.sidebar.markdown(content.SIDEBAR_FACILITATORS, unsafe_allow_html=True)
 st.sidebar.markdown("---")
 user_id = st.sidebar.text_input("Participant ID")
-DEFAULT = {"progress": 0, "logs": [], "pretest": {}, "day2_logs": [], "day3": {}}
-data = load(user_id) if user_id else DEFAULT
+if user_id:
+    repo = repository.get()
+    saved_email = storage.contact(repo.reader(), user_id)
+    email = st.sidebar.text_input("Reminder email (optional)", value=saved_email,
+                                  help="Get a reminder on evenings you haven't logged. Clear it to stop.").strip()
+    if email and "@" not in email:
+        st.sidebar.error("That doesn't look like an email address.")
+    elif email != saved_email:
+        repo.write(storage.set_contact, user_id, email)
+    with st.sidebar:
+        drafts.autosave(user_id)
+get_compactor()
+get_watcher()
+data = load(user_id) if user_id else storage.empty()
+if st.query_params.get("debug"):
+    st.sidebar.caption("Participant cache: " + ", ".join(k + "=" + str(v) for k, v in cache.participants.stats().items()))
 
 
 
 
-tab0, tab1, tab2, tab3, tab4 = st.tabs(["Overview", "Dashboard", "Day 1", "Day 2", "Day 3"])
+tab0, tab1, tab2, tab3, tab4 = st.tabs(["Overview", "Dashboard", "Day 1", "Day 2", "Day 3"], key="tab",
+                                       on_change=drafts.flush, args=(user_id,))
 
 # ── OVERVIEW ──────────────────────────────────────────
-with tab0:
+with tab0, instrument.span("tab.overview"):
     st.title("Social Media Usage Training")
-    st.markdown(f"**Module:** {MODULE_NAME}")
-    st.markdown(f"**Course:** {COURSE_NAME}")
-    st.markdown("**Facilitators:** " + ", ".join(FACILITATORS))
-    st.markdown("---")
-    
-    st.markdown("**Target:** Young adults and students with problematic social media use")
-
-    st.markdown("**Duration:** 14 days — 3 online sessions + individual work")
-    st.markdown("**Theory:** Action Regulation Theory — moving from automatic to intentional behavior")
+    st.markdown(content.OVERVIEW_INTRO)
 
     st.subheader("Why This Matters")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.error("Emotional Impact")
-        st.write("Anxiety, stress, emotional exhaustion, low well-being")
-    with col2:
-        st.warning("Cognitive Impact")
-        st.write("Attention deficit, FOMO, cognitive decline, memory issues")
-    with col3:
-        st.info("Behavioral Impact")
-        st.write("Sleep disruption, procrastination, diminished performance")
+    for col, (kind, title, text) in zip(st.columns(3), content.IMPACTS):
+        with col:
+            getattr(st, kind)(title)
+            st.write(text)
 
     st.subheader("Program Goal")
-    st.success("Move from uncontrolled, excessive SMU → intentional, reduced, disciplined usage")
+    st.success(content.PROGRAM_GOAL)
 
     st.subheader("What You Will Achieve")
-    goals = [
-        "Screen time reduced to 1-2 hrs/day leisure",
-        "Fewer distractions during daily tasks",
-        "Better sleep quality",
-        "Stronger ability to resist urges",
-        "Higher life satisfaction",
-        "Better self-esteem and emotional coping"
-    ]
-    for g in goals:
-        st.markdown("- " + g)
+    st.markdown(content.GOALS_MD)
 
 # ── DASHBOARD ─────────────────────────────────────────
-with tab1:
+with tab1, instrument.span("tab.dashboard"):
     st.header("Dashboard")
     if not user_id:
         st.warning("Enter your Participant ID in the sidebar.")
     else:
+        summary = cache.participants.summary(user_id)
         col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Days Done", data["progress"])
-        col2.metric("Progress", str(round(data["progress"] / 3 * 100)) + "%")
-        if data["logs"]:
-            df = pd.DataFrame(data["logs"])
-            col3.metric("Avg Usage", str(round(df["duration"].mean())) + " min")
-            col4.metric("Sessions Logged", len(data["logs"]))
-            fig = px.line(df, x="date", y="duration", title="Daily SMU Trend — Target: Decreasing")
+        col1.metric("Days Done", summary["progress"])
+        col2.metric("Progress", str(round(summary["progress"] / 3 * 100)) + "%")
+        if summary["log_count"]:
+            col3.metric("Avg Usage", str(round(summary["duration_mean"])) + " min")
+            col4.metric("Sessions Logged", summary["log_count"])
+            with instrument.span("chart.usage"):
+                fig = charts.usage_figure(user_id, cache.participants.version(user_id), data["logs"])
             st.plotly_chart(fig, use_container_width=True)
             st.subheader("Full Log")
-            df["apps"] = df["apps"].apply(lambda x: ", ".join(x) if isinstance(x, list) else str(x))
-            st.dataframe(df, use_container_width=True)
-            st.download_button("Download CSV", df.to_csv(index=False), "smu_data.csv")
+            full_log(user_id)
             if st.button("Send Full Report to Email"):
-                if send_email(user_id, data):
-                    st.success("Report sent!")
+                message_id = send_email(user_id, data)
+                if message_id:
+                    st.session_state["report_id"] = message_id
+                    st.session_state.pop("report_result", None)
                 else:
                     st.error("Check Streamlit Secrets settings.")
+            if st.session_state.get("report_id"):
+                report_status(st.session_state["report_id"])
+            elif st.session_state.get("report_result"):
+                report_result(st.session_state["report_result"])
         else:
             col3.metric("Avg Usage", "0 min")
             col4.metric("Sessions Logged", 0)
             st.info("Complete Day 1 to see your data here.")
 
 # ── DAY 1 ─────────────────────────────────────────────
-with tab2:
+with tab2, instrument.span("tab.day1"):
     st.header("Day 1 — Psychoeducation & Awareness")
     st.caption("Session duration: 60-90 min")
     if not user_id:
         st.warning("Enter your ID first.")
     else:
         with st.expander("What is SMU and PSMU?", expanded=False):
-            st.markdown("""
-**SMU** = Social Media Usage. **PSMU** = Problematic SMU — a self-regulation issue, NOT a willpower problem.
-
-**Why is social media addictive?**
-- Dopamine release + variable rewards (like a slot machine)
-- Every like, comment, notification = unpredictable reward
-
-**Key Models explaining PSMU:**
-- **I-PACE Model** — Interaction of Person, Affect, Cognition, Execution
-- **Self-Regulation Failure** (Baumeister) — goal pursuit breaks down under stress
-- **Dual-Process Model** (Kahneman) — automatic (fast) vs deliberate (slow) thinking
-- **Action Regulation Theory** (Hacker) — behavior regulated by goal-setting and monitoring
-- **Classical & Operant Conditioning** — habitual triggers reinforced over time
-
-**Harms:** Attention deficit, sleep disruption, anxiety, low self-esteem, FOMO, body image concerns
-            """)
+            st.markdown(content.WHAT_IS_SMU)
+        drafts.restore(user_id, "day1", DAY1_FORM)
 
         st.subheader("Pre-Test Assessment")
         st.caption("Baseline — to compare with your results after Day 3")
         pre_col1, pre_col2 = st.columns(2)
         with pre_col1:
-            pre_screen = st.number_input("Daily SM time (leisure, min)", 0, 1440, 120, key="pre_screen")
-            pre_distract = st.number_input("Times distracted by phone today", 0, 100, 10, key="pre_distract")
-            pre_sleep = st.slider("Sleep quality (1=poor, 10=great)", 1, 10, 5, key="pre_sleep")
-            pre_life = st.slider("Life satisfaction (1=low, 10=high)", 1, 10, 5, key="pre_life")
+            pre_screen = st.number_input("Daily SM time (leisure, min)", 0, 1440, key="day1.pre_screen")
+            pre_distract = st.number_input("Times distracted by phone today", 0, 100, key="day1.pre_distract")
+            pre_sleep = st.slider("Sleep quality (1=poor, 10=great)", 1, 10, key="day1.pre_sleep")
+            pre_life = st.slider("Life satisfaction (1=low, 10=high)", 1, 10, key="day1.pre_life")
         with pre_col2:
-            pre_focus = st.selectbox("Can you resist SM urges?", ["Never", "Rarely", "Sometimes", "Often", "Always"], key="pre_focus")
-            pre_cope = st.text_input("How do you deal with urges to use SM?", key="pre_cope")
-            pre_spare = st.number_input("Spare time per day (min)", 0, 1440, 120, key="pre_spare")
-            pre_goal = st.number_input("Desired SM time per day (min)", 0, 600, 60, key="pre_goal")
+            pre_focus = st.selectbox("Can you resist SM urges?", ["Never", "Rarely", "Sometimes", "Often", "Always"], key="day1.pre_focus")
+            pre_cope = st.text_input("How do you deal with urges to use SM?", key="day1.pre_cope")
+            pre_spare = st.number_input("Spare time per day (min)", 0, 1440, key="day1.pre_spare")
+            pre_goal = st.number_input("Desired SM time per day (min)", 0, 600, key="day1.pre_goal")
 
         st.subheader("Usage Tracker — Homework")
-        apps = st.multiselect("Platforms used most", ["Instagram", "TikTok", "Snapchat", "X", "YouTube", "Reddit", "LinkedIn"])
-        duration = st.slider("Total daily usage (min)", 0, 600, 120)
-        reasons = st.multiselect("Why do you use SM?", ["Boredom", "FOMO", "Relaxation", "Validation/Likes", "Social connection", "Habit", "Work/Study"])
-        trigger = st.text_input("Main trigger (when/where do you use it most?)")
-        emotion_before = st.selectbox("How do you feel BEFORE opening SM?", ["Bored", "Anxious", "Lonely", "Fine", "Stressed", "Curious"])
-        emotion_after = st.selectbox("How do you feel AFTER using SM?", ["Relaxed", "Anxious", "Empty", "Fine", "Distracted", "Guilty"])
-        consequences = st.multiselect("Consequences you notice personally", ["Less sleep", "Less focus", "Anxiety", "Wasted time", "Comparison", "Procrastination"])
+        apps = st.multiselect("Platforms used most", ["Instagram", "TikTok", "Snapchat", "X", "YouTube", "Reddit", "LinkedIn"], key="day1.apps")
+        duration = st.slider("Total daily usage (min)", 0, 600, key="day1.duration")
+        reasons = st.multiselect("Why do you use SM?", ["Boredom", "FOMO", "Relaxation", "Validation/Likes", "Social connection", "Habit", "Work/Study"], key="day1.reasons")
+        trigger = st.text_input("Main trigger (when/where do you use it most?)", key="day1.trigger")
+        emotion_before = st.selectbox("How do you feel BEFORE opening SM?", ["Bored", "Anxious", "Lonely", "Fine", "Stressed", "Curious"], key="day1.emotion_before")
+        emotion_after = st.selectbox("How do you feel AFTER using SM?", ["Relaxed", "Anxious", "Empty", "Fine", "Distracted", "Guilty"], key="day1.emotion_after")
+        consequences = st.multiselect("Consequences you notice personally", ["Less sleep", "Less focus", "Anxiety", "Wasted time", "Comparison", "Procrastination"], key="day1.consequences")
+
+        with st.expander("Import a screen-time export instead (CSV/JSON)"):
+            upload = st.file_uploader("Per-app usage export from your phone", type=["csv", "json", "jsonl", "ndjson"])
+            unit = st.selectbox("Unit of a plain 'duration' column", ["s", "ms", "min"])
+            if upload is not None and st.button("Import usage"):
+                import ingest
+                try:
+                    with instrument.span("ingest"):
+                        stats = ingest.ingest_upload(user_id, upload, unit)
+                except ValueError as e:
+                    st.error("Could not read this file: " + str(e))
+                else:
+                    cache.participants.invalidate(user_id)
+                    data = load(user_id)
+                    st.success("Imported %d days (%d already logged) from %d rows." % (
+                        stats["logs_added"], stats["days_skipped"], stats["rows"]))
 
         st.subheader("Trigger Diary")
-        trigger_when = st.text_input("When did you use SM today? (situation)")
-        trigger_why = st.text_input("Why did you open it?")
-        trigger_felt = st.text_area("How did it feel during and after?")
+        trigger_when = st.text_input("When did you use SM today? (situation)", key="day1.trigger_when")
+        trigger_why = st.text_input("Why did you open it?", key="day1.trigger_why")
+        trigger_felt = st.text_area("How did it feel during and after?", key="day1.trigger_felt")
 
         if st.button("Save Day 1", use_container_width=True):
-            d = load(user_id)
-            d["progress"] = max(d["progress"], 1)
-            d["pretest"] = {
+            pretest = {
                 "daily_sm_min": pre_screen, "distractions": pre_distract,
                 "sleep": pre_sleep, "life_satisfaction": pre_life,
                 "focus": pre_focus, "coping": pre_cope,
                 "spare_time": pre_spare, "goal_time": pre_goal
             }
-            d["logs"].append({
+            log = {
                 "date": str(date.today()), "duration": duration,
-                "apps": str(apps), "trigger": trigger,
+                "apps": apps, "trigger": trigger,
                 "emotion_before": emotion_before, "emotion_after": emotion_after,
-                "reasons": str(reasons), "consequences": str(consequences),
+                "reasons": reasons, "consequences": consequences,
                 "trigger_when": trigger_when, "trigger_why": trigger_why,
                 "trigger_felt": trigger_felt
-            })
-            save(user_id, d)
-            data.update(d)
+            }
+            save(user_id, 1, log=log, pretest=pretest, draft="day1")
+            drafts.submitted("day1")
+            data = load(user_id)
             st.success("Day 1 saved! Well done — you took the first step.")
 
 # ── DAY 2 ─────────────────────────────────────────────
-with tab3:
+with tab3, instrument.span("tab.day2"):
     st.header("Day 2 — Triggers, Urges & Strategies")
     st.caption("Session duration: 60-90 min")
     if not user_id:
@@ -238,73 +270,53 @@ with tab3:
         st.warning("Complete Day 1 first.")
     else:
         with st.expander("Key Concepts", expanded=False):
-            st.markdown("""
-**Triggers:**
-- Internal: Boredom, FOMO, anxiety, need for validation
-- External: Notifications, seeing others on phones, environmental cues
-
-**Urge Curve:**
-Urges rise quickly, peak around 10 min, then naturally drop — you don't have to act on them.
-
-**Delay-and-Decide Principle:** Wait 10 minutes before opening SM. Ask yourself:
-- "What do I expect from opening this app?"
-- "What usually happens after 10 minutes of scrolling?"
-
-**Intentional vs Automatic Use:**
-- Automatic = habit-driven, no conscious choice
-- Intentional = deliberate, time-limited, purpose-driven
-
-**Emotional Regulation Tools:**
-- Emotional tolerance — sit with discomfort without reacting
-- If-Then plans — "IF I feel bored, THEN I will go for a walk"
-- Cognitive reappraisal — reframe the urge
-            """)
+            st.markdown(content.DAY2_CONCEPTS)
+        drafts.restore(user_id, "day2", DAY2_FORM)
 
         st.subheader("Your If-Then Plan")
         col1, col2 = st.columns(2)
         with col1:
-            if_trigger = st.text_input("IF I feel / experience...")
+            if_trigger = st.text_input("IF I feel / experience...", key="day2.if_trigger")
         with col2:
-            then_action = st.text_input("THEN I will instead...")
+            then_action = st.text_input("THEN I will instead...", key="day2.then_action")
 
         st.subheader("Socratic Reflection")
-        expect = st.text_input("What do I expect from opening this app?")
-        after10 = st.text_input("What usually happens after 10 minutes of scrolling?")
+        expect = st.text_input("What do I expect from opening this app?", key="day2.expect")
+        after10 = st.text_input("What usually happens after 10 minutes of scrolling?", key="day2.after10")
 
         st.subheader("Digital Hygiene Checklist")
         c1, c2 = st.columns(2)
-        t1 = c1.checkbox("Set daily time limits on SM apps")
-        t2 = c1.checkbox("Remove SM apps from home screen")
-        t3 = c1.checkbox("Turn off all non-essential notifications")
-        t4 = c2.checkbox("Created a screen-free zone (bedroom/dining)")
-        t5 = c2.checkbox("1 hour phone-free before bed")
-        t6 = c2.checkbox("Tried grey mode on phone")
+        t1 = c1.checkbox("Set daily time limits on SM apps", key="day2.t1")
+        t2 = c1.checkbox("Remove SM apps from home screen", key="day2.t2")
+        t3 = c1.checkbox("Turn off all non-essential notifications", key="day2.t3")
+        t4 = c2.checkbox("Created a screen-free zone (bedroom/dining)", key="day2.t4")
+        t5 = c2.checkbox("1 hour phone-free before bed", key="day2.t5")
+        t6 = c2.checkbox("Tried grey mode on phone", key="day2.t6")
 
         st.subheader("Today's Usage Log")
-        duration2 = st.slider("Today's SM usage (min)", 0, 600, 90)
-        trigger2 = st.text_input("Main trigger today")
-        what_helped = st.text_area("What strategy helped most today?")
+        duration2 = st.slider("Today's SM usage (min)", 0, 600, key="day2.duration2")
+        trigger2 = st.text_input("Main trigger today", key="day2.trigger2")
+        what_helped = st.text_area("What strategy helped most today?", key="day2.what_helped")
 
         if st.button("Save Day 2", use_container_width=True):
             if sum([t1, t2, t3, t4, t5, t6]) >= 2:
-                d = load(user_id)
-                d["progress"] = max(d["progress"], 2)
-                d["logs"].append({
+                log = {
                     "date": str(date.today()), "duration": duration2,
-                    "apps": "", "trigger": trigger2,
+                    "apps": [], "trigger": trigger2,
                     "emotion_before": "", "emotion_after": "",
-                    "reasons": "", "consequences": "",
+                    "reasons": [], "consequences": [],
                     "trigger_when": if_trigger, "trigger_why": then_action,
                     "trigger_felt": what_helped
-                })
-                save(user_id, d)
-                data.update(d)
+                }
+                save(user_id, 2, log=log, draft="day2")
+                drafts.submitted("day2")
+                data = load(user_id)
                 st.success("Day 2 saved! Great work applying these strategies.")
             else:
                 st.error("Complete at least 2 digital hygiene tasks to proceed.")
 
 # ── DAY 3 ─────────────────────────────────────────────
-with tab4:
+with tab4, instrument.span("tab.day3"):
     st.header("Day 3 — Maintenance & Relapse Prevention")
     st.caption("Session duration: 60-90 min")
     if not user_id:
@@ -313,57 +325,38 @@ with tab4:
         st.warning("Complete Day 2 first.")
     else:
         with st.expander("Key Concepts", expanded=False):
-            st.markdown("""
-**Lapse vs Relapse:**
-- Lapse = one slip (normal, expected)
-- Relapse = return to old patterns (preventable)
-- One bad day does NOT mean failure — self-compassion is key
-
-**Identity & Values Alignment:**
-Maintenance is not just behavioral — it's motivational.
-Ask: "Who do I want to be? Does this SM habit serve that person?"
-
-**Handling Challenges:**
-- Social pressure: It's okay to be present without your phone
-- Boredom in social contexts: Reconnect with face-to-face interaction
-- Work/study: Define what counts as necessary SM use
-
-**Personal SMU Rules (be specific):**
-Define: WHEN, HOW LONG, FOR WHAT PURPOSE
-Example: "I use Instagram only after 7pm, max 20 min, to message friends — not to scroll."
-            """)
+            st.markdown(content.DAY3_CONCEPTS)
+        drafts.restore(user_id, "day3", DAY3_FORM)
 
         st.subheader("Reflection")
-        what_changed = st.text_area("What changed during this training?")
-        what_worked = st.text_area("What worked best for you?")
-        what_hardest = st.text_area("What was the hardest part?")
+        what_changed = st.text_area("What changed during this training?", key="day3.what_changed")
+        what_worked = st.text_area("What worked best for you?", key="day3.what_worked")
+        what_hardest = st.text_area("What was the hardest part?", key="day3.what_hardest")
 
         st.subheader("Your Personal SMU Rules (write 3-5)")
-        rules = st.text_area("My rules for social media use (be specific: when, how long, for what purpose)")
+        rules = st.text_area("My rules for social media use (be specific: when, how long, for what purpose)", key="day3.rules")
 
         st.subheader("Relapse Prevention Plan")
-        warning_signs = st.text_input("3 early warning signs I'm slipping back")
-        recovery_plan = st.text_area("If I relapse, I will...")
-        support = st.text_input("My accountability partner (name)")
+        warning_signs = st.text_input("3 early warning signs I'm slipping back", key="day3.warning_signs")
+        recovery_plan = st.text_area("If I relapse, I will...", key="day3.recovery_plan")
+        support = st.text_input("My accountability partner (name)", key="day3.support")
 
         st.subheader("Post-Test Assessment")
         st.caption("Compare with your Day 1 baseline")
         post_col1, post_col2 = st.columns(2)
         with post_col1:
-            post_screen = st.number_input("Daily SM time now (leisure, min)", 0, 1440, 60, key="post_screen")
-            post_distract = st.number_input("Times distracted by phone today", 0, 100, 5, key="post_distract")
-            post_sleep = st.slider("Sleep quality now (1-10)", 1, 10, 7, key="post_sleep")
-            post_life = st.slider("Life satisfaction now (1-10)", 1, 10, 7, key="post_life")
+            post_screen = st.number_input("Daily SM time now (leisure, min)", 0, 1440, key="day3.post_screen")
+            post_distract = st.number_input("Times distracted by phone today", 0, 100, key="day3.post_distract")
+            post_sleep = st.slider("Sleep quality now (1-10)", 1, 10, key="day3.post_sleep")
+            post_life = st.slider("Life satisfaction now (1-10)", 1, 10, key="day3.post_life")
         with post_col2:
-            post_focus = st.selectbox("Can you resist SM urges now?", ["Never", "Rarely", "Sometimes", "Often", "Always"], key="post_focus")
-            post_cope = st.text_input("How do you deal with urges now?", key="post_cope")
-            more_time = st.selectbox("Do you feel you have more time?", ["No", "A little", "Yes", "Definitely"], key="more_time")
+            post_focus = st.selectbox("Can you resist SM urges now?", ["Never", "Rarely", "Sometimes", "Often", "Always"], key="day3.post_focus")
+            post_cope = st.text_input("How do you deal with urges now?", key="day3.post_cope")
+            more_time = st.selectbox("Do you feel you have more time?", ["No", "A little", "Yes", "Definitely"], key="day3.more_time")
 
         if st.button("Complete Program", use_container_width=True):
             if rules and warning_signs:
-                d = load(user_id)
-                d["progress"] = 3
-                d["day3"] = {
+                day3 = {
                     "rules": rules, "warning_signs": warning_signs,
                     "recovery_plan": recovery_plan, "support": support,
                     "what_changed": what_changed, "what_worked": what_worked,
@@ -374,31 +367,33 @@ Example: "I use Instagram only after 7pm, max 20 min, to message friends — not
                         "focus": post_focus, "coping": post_cope, "more_time": more_time
                     }
                 }
-                d["logs"].append({
+                log = {
                     "date": str(date.today()), "duration": post_screen,
-                    "apps": "", "trigger": warning_signs,
+                    "apps": [], "trigger": warning_signs,
                     "emotion_before": "", "emotion_after": "",
-                    "reasons": "", "consequences": "",
+                    "reasons": [], "consequences": [],
                     "trigger_when": "", "trigger_why": "",
                     "trigger_felt": recovery_plan
-                })
-                save(user_id, d)
+                }
+                save(user_id, 3, log=log, day3=day3, draft="day3")
+                drafts.submitted("day3")
                 st.success("Program complete! Review your Dashboard to see your full journey.")
                 st.balloons()
 
                 if data.get("pretest"):
                     st.subheader("Your Progress (Pre vs Post)")
                     pre = data["pretest"]
-                    metrics = {
-                        "SM Usage (min)": [pre.get("daily_sm_min", 0), post_screen],
-                        "Distractions": [pre.get("distractions", 0), post_distract],
-                        "Sleep Quality": [pre.get("sleep", 0), post_sleep],
-                        "Life Satisfaction": [pre.get("life_satisfaction", 0), post_life]
+                    before = {
+                        "SM Usage (min)": pre.get("daily_sm_min", 0),
+                        "Distractions": pre.get("distractions", 0),
+                        "Sleep Quality": pre.get("sleep", 0),
+                        "Life Satisfaction": pre.get("life_satisfaction", 0)
                     }
-                    comp_df = pd.DataFrame(metrics, index=["Before", "After"]).T.reset_index()
-                    comp_df.columns = ["Metric", "Before", "After"]
-                    fig2 = px.bar(comp_df, x="Metric", y=["Before", "After"],
-                                 barmode="group", title="Pre vs Post Training Comparison")
+                    after = dict(zip(before, [post_screen, post_distract, post_sleep, post_life]))
+                    with instrument.span("chart.prepost"):
+                        fig2 = charts.prepost_figure(before, after)
                     st.plotly_chart(fig2, use_container_width=True)
             else:
                 st.error("Write your personal rules and warning signs to complete.")
+
+rerun.finish()
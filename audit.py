@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import json
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+import storage
+
+# Append-only, hash-chained record of every change to study data. One entry per
+# section a save touched (progress, pretest, day3, posttest, log, usage): who, when,
+# which fields, and hashes of the section's old and new values. Each entry's hash
+# covers the previous entry's hash, so editing or removing any row breaks the
+# chain from there on. Saves only enqueue; a writer thread hashes and appends
+# in batches.
+
+GENESIS = "0" * 64
+FLUSH_SECONDS = 0.2
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 5
+RETRY_SECONDS = 1.0
+EXIT_FLUSH_SECONDS = 10.0
+CHUNK_ROWS = 10000
+SECTIONS = {"pretest": storage.PRETEST_FIELDS, "day3": storage.DAY3_FIELDS,
+            "posttest": storage.POSTTEST_FIELDS, "log": storage.LOG_FIELDS}
+COLUMNS = ["seq", "at", "participant_id", "actor", "section", "version", "fields", "old_hash", "new_hash"]
+
+
+def _canon(v):
+    # the same answer hashes the same whether it came from a widget or back from the database
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, dict):
+        return {k: _canon(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_canon(x) for x in v]
+    return v
+
+
+def section_value(section, d):
+    if d is None:
+        return None
+    if section == "progress":
+        return d
+    if section == "usage":
+        return {k: _canon(v) for k, v in d.items()}
+    fields = SECTIONS[section]
+    return {f: _canon(d.get(f)) for f in fields}
+
+
+def digest(section, d):
+    v = section_value(section, d)
+    if v is None:
+        return None
+    return hashlib.sha256(json.dumps(v, sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                                     default=str).encode()).hexdigest()
+
+
+def changes(before, progress=None, logs=(), pretest=None, day3=None, usage=None):
+    # [(section, changed fields, old value, new value)] for one save; usage holds the
+    # imported per-platform minutes that changed, keyed "date platform"
+    out = []
+    if progress is not None and progress > before.get("progress", 0):
+        out.append(("progress", ["progress"], before.get("progress", 0), progress))
+    news = {"pretest": pretest, "day3": day3, "posttest": (day3 or {}).get("posttest")}
+    for section in ["pretest", "day3", "posttest"]:
+        if news[section] is None:
+            continue
+        old, new = section_value(section, before.get(section)), section_value(section, news[section])
+        fields = [f for f in SECTIONS[section] if (old or {}).get(f) != new[f]]
+        if fields:
+            out.append((section, fields, before.get(section), news[section]))
+    for log in logs:
+        out.append(("log", [f for f in storage.LOG_FIELDS if log.get(f) not in (None, "", [])], None, log))
+    if usage:
+        old = before.get("usage") or {}
+        out.append(("usage", sorted(usage), {k: old.get(k) for k in usage}, usage))
+    if not out:
+        # every save moves the version, so even one that changed nothing gets an entry
+        p = max(before.get("progress", 0), progress or 0)
+        out.append(("progress", [], p, p))
+    return out
+
+
+def chain(prev, row):
+    # row: the COLUMNS values, with fields as stored (JSON text)
+    return hashlib.sha256((prev + json.dumps(row, separators=(",", ":"), ensure_ascii=False)).encode()).hexdigest()
+
+
+# ── WRITER ────────────────────────────────────────────
+
+def _append(conn, entries):
+    with conn:
+        conn.execute("INSERT INTO audit_head (id, seq, hash) VALUES (1, 0, ?) ON CONFLICT (id) DO NOTHING",
+                     (GENESIS,))
+        # the head row's lock serializes appenders across threads and processes
+        seq, prev = conn.execute("UPDATE audit_head SET seq=seq WHERE id=1 RETURNING seq, hash").fetchone()
+        rows = []
+        for entry in entries:
+            seq += 1
+            row = [seq] + entry
+            prev = chain(prev, row)
+            rows.append(row + [prev])
+        conn.executemany("INSERT INTO audit_log (" + ", ".join(COLUMNS) + ", hash) VALUES (" + ", ".join("?" * 10)
+                         + ")", rows)
+        conn.execute("UPDATE audit_head SET seq=?, hash=? WHERE id=1", (seq, prev))
+    return seq
+
+
+class AuditWriter:
+    # record() is the only part on the save path: it enqueues and returns
+
+    def __init__(self, repo, flush_seconds=FLUSH_SECONDS, batch_size=BATCH_SIZE):
+        self.repo = repo
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.errors = 0
+        self.dropped = 0
+
+    def record(self, uid, version, actor, before, progress=None, logs=(), pretest=None, day3=None, usage=None):
+        # queue items are (attempts so far, save)
+        self.queue.put((0, (datetime.now().isoformat(timespec="milliseconds"), uid, version, actor, before,
+                            progress, list(logs), pretest, day3, usage)))
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="smu-audit", daemon=True)
+                    self.thread.start()
+
+    def _entries(self, item):
+        at, uid, version, actor, before, progress, logs, pretest, day3, usage = item
+        return [[at, uid, actor, section, version, json.dumps(fields), digest(section, old), digest(section, new)]
+                for section, fields, old, new in changes(before, progress, logs, pretest, day3, usage)]
+
+    def _run(self):
+        while True:
+            items = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                entries = [e for _, item in items for e in self._entries(item)]
+                if entries:
+                    self.repo.write(_append, entries)
+            except Exception as e:
+                self.errors += 1
+                retry = [(n + 1, item) for n, item in items if n + 1 < MAX_ATTEMPTS]
+                if len(retry) < len(items):
+                    self.dropped += len(items) - len(retry)
+                    print("audit: dropped %d saves after %d failed attempts: %r"
+                          % (len(items) - len(retry), MAX_ATTEMPTS, e), file=sys.stderr)
+                for item in retry:
+                    self.queue.put(item)
+                time.sleep(RETRY_SECONDS)
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+
+    def flush(self, timeout=None):
+        # block until everything recorded so far is in audit_log (or dropped), at most
+        # timeout seconds; returns whether the queue drained
+        if self.thread is None:
+            return True
+        done = self.queue.all_tasks_done
+        with done:
+            drained = done.wait_for(lambda: not self.queue.unfinished_tasks, timeout)
+        if not drained:
+            print("audit: gave up waiting after %.1fs with saves still unwritten" % timeout, file=sys.stderr)
+        return drained
+
+
+# ── VERIFY ────────────────────────────────────────────
+
+def verify(conn, chunk_rows=CHUNK_ROWS):
+    # streams the chain in seq order, then checks each participant's stored sections
+    # against the newest audited hash
+    report = {"entries": 0, "broken_at": None, "head_ok": None, "unaudited": [], "mismatched": []}
+    prev, expected, latest, versions = GENESIS, 1, {}, {}
+    cur = storage.stream(conn, "SELECT " + ", ".join(COLUMNS) + ", hash FROM audit_log ORDER BY seq")
+    while True:
+        rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            cur.close()
+            break
+        for r in rows:
+            row = list(r[:-1])
+            if report["broken_at"] is None:
+                if row[0] != expected or chain(prev, row) != r[-1]:
+                    report["broken_at"] = row[0]
+                prev = r[-1]
+                expected = row[0] + 1
+            report["entries"] += 1
+            uid, section, version = row[2], row[4], row[5]
+            if section in ("pretest", "day3", "posttest"):
+                latest[(uid, section)] = row[8]
+            versions[uid] = max(versions.get(uid, 0), version or 0)
+    head = conn.execute("SELECT seq, hash FROM audit_head WHERE id=1").fetchone()
+    report["head_ok"] = head is None and report["entries"] == 0 or (
+        head is not None and report["broken_at"] is None and head[0] == expected - 1 and head[1] == prev)
+    for uid, version in conn.execute("SELECT id, version FROM participants ORDER BY id"):
+        if versions.get(uid, 0) < version:
+            report["unaudited"].append(uid)
+    for section in ("pretest", "day3", "posttest"):
+        fields = SECTIONS[section]
+        for r in conn.execute("SELECT participant_id, " + storage._cols(fields) + " FROM " + section):
+            h = latest.get((r[0], section))
+            if h is not None and h != digest(section, dict(zip(fields, r[1:]))):
+                report["mismatched"].append((r[0], section))
+    return report
+
+
+def history(conn, uid):
+    cur = conn.execute("SELECT " + ", ".join(COLUMNS) + " FROM audit_log WHERE participant_id=? ORDER BY seq",
+                       (uid,))
+    return [dict(zip(COLUMNS, r)) for r in cur]
+
+
+if __name__ == "__main__":
+    import repository
+    ap = argparse.ArgumentParser(description="Check or show the audit trail.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("verify", help="validate the hash chain and compare stored answers with it")
+    show = sub.add_parser("show", help="print one participant's audit entries")
+    show.add_argument("participant")
+    args = ap.parse_args()
+    conn = repository.get().reader()
+    if args.cmd == "show":
+        for e in history(conn, args.participant):
+            print(e["seq"], e["at"], e["actor"], e["section"], "v%s" % e["version"], e["fields"],
+                  (e["old_hash"] or "-")[:12], "->", (e["new_hash"] or "-")[:12])
+    else:
+        t0 = time.perf_counter()
+        r = verify(conn)
+        dt = time.perf_counter() - t0
+        print("%d entries in %.2fs (%.0f/s)" % (r["entries"], dt, r["entries"] / dt if dt else 0))
+        print("chain:", "OK" if r["broken_at"] is None and r["head_ok"] else
+              "BROKEN at seq %s" % r["broken_at"] if r["broken_at"] is not None else "head mismatch (truncated?)")
+        print("participants with unaudited changes:", len(r["unaudited"]), " ".join(r["unaudited"][:20]))
+        print("sections changed outside the app:", len(r["mismatched"]),
+              " ".join("%s/%s" % m for m in r["mismatched"][:20]))
+        sys.exit(0 if r["broken_at"] is None and r["head_ok"] and not r["mismatched"] and not r["unaudited"] else 1)
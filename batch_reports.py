@@ -0,0 +1,243 @@
+import argparse
+import base64
+import html
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from string import Template
+import storage
+import repository
+import scheduler
+
+CHUNK = 8
+MANIFEST = "manifest.jsonl"
+CHART_SIZE = (720, 360)
+PREPOST = [("SM Usage (min)", "daily_sm_min"), ("Distractions", "distractions"),
+           ("Sleep Quality", "sleep"), ("Life Satisfaction", "life_satisfaction")]
+LOG_COLUMNS = ["date", "duration", "apps", "trigger", "emotion_before", "emotion_after", "reasons", "consequences"]
+
+# compiled once per process; every value is escaped before substitution
+PAGE = Template("""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>SMU Report - $participant</title>
+<style>
+body{font-family:Helvetica,Arial,sans-serif;max-width:780px;margin:2em auto;color:#222}
+table{border-collapse:collapse;width:100%;font-size:13px}th,td{border:1px solid #ccc;padding:4px 6px;text-align:left}
+th{background:#f3f3f3}h2{margin-top:1.6em;border-bottom:1px solid #ddd}.muted{color:#777}
+</style></head><body>
+<h1>SMU Training Report</h1>
+<p>Participant <b>$participant</b> &middot; $progress of 3 days completed &middot; $log_count usage logs</p>
+$chart
+$pretest
+<h2>Usage logs</h2>
+$logs
+$day3
+<p class="muted">Generated $generated</p>
+</body></html>
+""")
+CHART = Template("""<h2>Pre vs post</h2>
+<img alt="Pre vs post comparison" width="$width" height="$height" src="data:image/png;base64,$png">""")
+SECTION = Template("<h2>$title</h2>\n<table>$rows</table>")
+ROW = Template("<tr><th>$key</th><td>$value</td></tr>")
+TABLE = Template("<table><tr>$head</tr>$rows</table>")
+
+_repo = None
+
+
+def _e(v):
+    return html.escape("" if v is None else ", ".join(v) if isinstance(v, list) else str(v))
+
+
+# ── RENDER ────────────────────────────────────────────
+
+def prepost_png(before, after, size=CHART_SIZE):
+    # grouped bars like charts.prepost_figure, rasterized with Pillow (already a Streamlit dependency)
+    from PIL import Image, ImageDraw, ImageFont
+    w, h = size
+    img = Image.new("RGB", size, "white")
+    d = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=13)
+    left, top, bottom = 50, 30, h - 40
+    top_value = max([v for v in list(before.values()) + list(after.values()) if v] or [1])
+    d.line([(left, top), (left, bottom), (w - 10, bottom)], fill="#888")
+    d.text((left - 6, top), str(top_value), fill="#555", font=font, anchor="rm")
+    group = (w - left - 20) / len(before)
+    for i, label in enumerate(before):
+        x0 = left + 10 + i * group
+        for j, (v, color) in enumerate([(before[label], "#636efa"), (after.get(label), "#ef553b")]):
+            bh = (bottom - top) * (v or 0) / top_value
+            bx = x0 + j * group * 0.4
+            d.rectangle([bx, bottom - bh, bx + group * 0.36, bottom], fill=color)
+            d.text((bx + group * 0.18, bottom - bh - 3), str(v if v is not None else "-"), fill="#333", font=font,
+                   anchor="md")
+        d.text((x0 + group * 0.38, bottom + 6), label, fill="#333", font=font, anchor="ma")
+    for k, (name, color) in enumerate([("Before", "#636efa"), ("After", "#ef553b")]):
+        d.rectangle([w - 150 + k * 70, 8, w - 140 + k * 70, 18], fill=color)
+        d.text((w - 136 + k * 70, 13), name, fill="#333", font=font, anchor="lm")
+    buf = io.BytesIO()
+    img.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def _table(title, d):
+    rows = "".join(ROW.substitute(key=_e(k), value=_e(v)) for k, v in d.items() if k != "posttest")
+    return SECTION.substitute(title=html.escape(title), rows=rows) if rows else ""
+
+
+def render_html(uid, data, generated=None):
+    pre, post = data.get("pretest") or {}, (data.get("day3") or {}).get("posttest") or {}
+    chart = ""
+    if pre and post:
+        before = {label: pre.get(f) for label, f in PREPOST}
+        after = {label: post.get(f) for label, f in PREPOST}
+        png = base64.b64encode(prepost_png(before, after)).decode()
+        chart = CHART.substitute(width=CHART_SIZE[0], height=CHART_SIZE[1], png=png)
+    logs = data["logs"]
+    log_table = TABLE.substitute(
+        head="".join("<th>" + c.replace("_", " ") + "</th>" for c in LOG_COLUMNS),
+        rows="".join("<tr>" + "".join("<td>" + _e(log.get(c)) + "</td>" for c in LOG_COLUMNS) + "</tr>"
+                     for log in logs)) if logs else "<p>No logs</p>"
+    day3 = {k: v for k, v in (data.get("day3") or {}).items() if k != "posttest"}
+    return PAGE.substitute(
+        participant=_e(uid), progress=data["progress"], log_count=len(logs), chart=chart,
+        pretest=_table("Pre-test answers", pre), logs=log_table,
+        day3=_table("Day 3 personal rules", day3) + _table("Post-test answers", post),
+        generated=_e(generated or datetime.now().isoformat(timespec="seconds")))
+
+
+# ── WORKERS ───────────────────────────────────────────
+
+def _init_worker(url):
+    global _repo
+    _repo = repository.get(url)
+
+
+def _render_chunk(uids, out_dir):
+    # runs in a pool process: load, render and (for directory output) write each report
+    results = []
+    for uid in uids:
+        data, version = _repo.load_versioned(uid)
+        page = render_html(uid, data)
+        if out_dir:
+            path = os.path.join(out_dir, file_name(uid))
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(page)
+            os.replace(path + ".tmp", path)
+            results.append((uid, version, len(page), None))
+        else:
+            results.append((uid, version, len(page), page))
+    return results
+
+
+def file_name(uid):
+    return re.sub(r"[^\w.-]", "_", uid) + ".html"
+
+
+# ── BATCH ─────────────────────────────────────────────
+
+def participants(conn, min_progress):
+    return conn.execute("SELECT id, version FROM participants WHERE progress>=? ORDER BY id",
+                        (min_progress,)).fetchall()
+
+
+def read_manifest(out_dir):
+    # uid -> version of every report already written
+    done = {}
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted run
+                done[entry["participant"]] = entry["version"]
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _queue_report(conn, uid, run, recipient, page, now):
+    # the notifications row makes the enqueue once-only per participant and run
+    with conn:
+        return scheduler._queue(conn, "report", uid, run, recipient, "SMU Report - " + uid, page, now, uid)
+
+
+def run(out_dir=None, run_name=None, to=None, url=None, workers=None, min_progress=1, chunk=CHUNK,
+        progress=None):
+    # out_dir: write <participant>.html there; otherwise queue each report in the outbox under
+    # run_name (to one facilitator address, or to each participant's reminder address)
+    url = url or repository.default_url()
+    repo = repository.get(url)
+    conn = repo.reader()
+    todo = participants(conn, min_progress)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        done = read_manifest(out_dir)
+        todo = [(uid, v) for uid, v in todo if done.get(uid) != v]
+        manifest = open(os.path.join(out_dir, MANIFEST), "a", encoding="utf-8")
+    else:
+        sent = {r[0] for r in conn.execute("SELECT target FROM notifications WHERE kind='report' AND due_date=?",
+                                           (run_name,))}
+        todo = [(uid, v) for uid, v in todo if uid not in sent]
+        if not to:
+            contacts = dict(conn.execute("SELECT participant_id, email FROM contacts").fetchall())
+            todo = [(uid, v) for uid, v in todo if uid in contacts]
+        manifest = None
+
+    stats = {"total": len(todo), "done": 0, "bytes": 0, "seconds": 0.0}
+    t0 = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(url,)) as pool:
+            futures = [pool.submit(_render_chunk, [uid for uid, _ in todo[i:i + chunk]], out_dir)
+                       for i in range(0, len(todo), chunk)]
+            for future in as_completed(futures):
+                for uid, version, size, page in future.result():
+                    if manifest:
+                        manifest.write(json.dumps({"participant": uid, "version": version, "file": file_name(uid),
+                                                   "at": datetime.now().isoformat(timespec="seconds")}) + "\n")
+                    else:
+                        recipient = to or storage.contact(repo.reader(), uid)
+                        repo.write(_queue_report, uid, run_name, recipient, page, time.time())
+                    stats["done"] += 1
+                    stats["bytes"] += size
+                if manifest:
+                    manifest.flush()
+                stats["seconds"] = time.perf_counter() - t0
+                if progress:
+                    progress(stats)
+    finally:
+        if manifest:
+            manifest.close()
+    stats["seconds"] = time.perf_counter() - t0
+    stats["reports_per_sec"] = stats["done"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def print_progress(s):
+    rate = s["done"] / s["seconds"] if s["seconds"] else 0.0
+    eta = (s["total"] - s["done"]) / rate if rate else 0.0
+    sys.stderr.write("\r%d/%d reports  %.1f/s  eta %.0fs " % (s["done"], s["total"], rate, eta))
+    sys.stderr.flush()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Render an HTML report with a pre/post chart for every participant.")
+    target = ap.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="directory for <participant>.html and the resume manifest")
+    target.add_argument("--outbox", metavar="RUN", help="queue the reports as emails, once per participant per RUN")
+    ap.add_argument("--to", default=None, help="with --outbox: send every report here instead of to participants")
+    ap.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    ap.add_argument("--min-progress", type=int, default=1)
+    ap.add_argument("--chunk", type=int, default=CHUNK, help="participants per task")
+    args = ap.parse_args()
+    s = run(args.out, args.outbox, args.to, workers=args.workers, min_progress=args.min_progress, chunk=args.chunk,
+            progress=print_progress)
+    sys.stderr.write("\n")
+    print("%d reports in %.1fs (%.1f/s, %.1f MB)" % (s["done"], s["seconds"], s["reports_per_sec"],
+                                                     s["bytes"] / 1e6))
@@ -0,0 +1,87 @@
+"""Cohort analytics on synthetic participants.
+
+    python benchmarks/bench_analytics.py --participants 100000 --logs-per 5 [--from-db]
+
+--from-db also writes the cohort to a temporary SQLite file and times load_frames().
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import analytics
+import storage
+
+PLATFORMS = ["Instagram", "TikTok", "Snapchat", "X", "YouTube", "Reddit", "LinkedIn"]
+REASONS = ["Boredom", "FOMO", "Relaxation", "Validation/Likes", "Social connection", "Habit", "Work/Study"]
+EMOTIONS = ["Bored", "Anxious", "Lonely", "Fine", "Stressed", "Curious"]
+
+
+def synthetic(n, logs_per, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = np.char.add("p", np.arange(n).astype(str))
+    pre = pd.DataFrame({"participant_id": ids,
+                        "daily_sm_min": rng.integers(30, 400, n),
+                        "sleep": rng.integers(1, 11, n),
+                        "life_satisfaction": rng.integers(1, 11, n)})
+    post = pre.copy()
+    post["daily_sm_min"] = (pre["daily_sm_min"] * rng.uniform(0.5, 1.1, n)).astype(int)
+    post["sleep"] = np.clip(pre["sleep"] + rng.integers(-1, 3, n), 1, 10)
+    post["life_satisfaction"] = np.clip(pre["life_satisfaction"] + rng.integers(-1, 3, n), 1, 10)
+    m = n * logs_per
+    app_str = np.array(["[" + ", ".join("'%s'" % p for p in PLATFORMS[i:i + 2]) + "]" for i in range(len(PLATFORMS))])
+    reason_str = np.array(["['%s']" % r for r in REASONS])
+    logs = pd.DataFrame({"participant_id": np.repeat(ids, logs_per),
+                         "date": np.tile(pd.date_range("2025-01-01", periods=logs_per).strftime("%Y-%m-%d"), n),
+                         "duration": rng.integers(0, 600, m),
+                         "apps": app_str[rng.integers(0, len(app_str), m)],
+                         "reasons": reason_str[rng.integers(0, len(reason_str), m)],
+                         "emotion_before": np.array(EMOTIONS)[rng.integers(0, len(EMOTIONS), m)],
+                         "emotion_after": ""})
+    parts = pd.DataFrame({"participant_id": ids, "progress": 3})
+    return {"participants": parts, "logs": logs, "pretest": pre, "posttest": post}
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    print("%-22s %8.3fs" % (label, time.perf_counter() - t0))
+    return out
+
+
+def to_db(frames, path):
+    conn = sqlite3.connect(path)
+    storage.init(conn)
+    parts = frames["participants"].assign(version=1, created_at="", updated_at="")
+    parts.rename(columns={"participant_id": "id"}).to_sql("participants", conn, if_exists="append", index=False)
+    frames["logs"].to_sql("logs", conn, if_exists="append", index=False)
+    frames["pretest"].to_sql("pretest", conn, if_exists="append", index=False)
+    frames["posttest"].to_sql("posttest", conn, if_exists="append", index=False)
+    conn.commit()
+    return conn
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--participants", type=int, default=100000)
+    ap.add_argument("--logs-per", type=int, default=5)
+    ap.add_argument("--from-db", action="store_true")
+    args = ap.parse_args()
+    frames = timed("generate", lambda: synthetic(args.participants, args.logs_per))
+    if args.from_db:
+        conn = timed("write sqlite", lambda: to_db(frames, os.path.join(tempfile.mkdtemp(), "bench.db")))
+        frames = timed("load_frames", lambda: analytics.load_frames(conn))
+    t0 = time.perf_counter()
+    effects = timed("paired_effects", lambda: analytics.paired_effects(frames["pretest"], frames["posttest"]))
+    timed("platform_usage", lambda: analytics.platform_usage(frames["logs"]))
+    timed("reason_frequencies", lambda: analytics.reason_frequencies(frames["logs"]))
+    timed("emotion_frequencies", lambda: analytics.emotion_frequencies(frames["logs"]))
+    timed("usage_trend", lambda: analytics.usage_trend(frames["logs"]))
+    print("%-22s %8.3fs  (%d participants, %d logs)" % ("total analytics", time.perf_counter() - t0,
+                                                       len(frames["participants"]), len(frames["logs"])))
+    print(effects.to_string(index=False))
@@ -0,0 +1,142 @@
+"""Per-event cost of the incremental relapse detector (anomaly.py).
+
+Replays --events synthetic log events in date order over --participants, so every
+participant's history keeps growing, and reports the cost per event for each tenth of
+the replay: first through anomaly.step() alone, then through anomaly.observe() on a
+temporary SQLite database (the work a save adds inside its transaction). Flat numbers
+from the first to the last tenth mean the cost does not depend on how much history
+there is. For contrast, --rebuild times anomaly.rebuild(), the full recomputation
+observe() replaces.
+
+    python benchmarks/bench_anomaly.py --events 2000000 --participants 1000 --db-events 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import anomaly  # noqa: E402
+import db  # noqa: E402
+import storage  # noqa: E402
+from bench_app import RESULTS, git_commit  # noqa: E402
+
+
+def events(n, participants, per_day, seed=0):
+    # (uid, log) in date order; each participant logs per_day times a day on ~85% of days,
+    # mostly near their own typical duration with occasional binges
+    rng = random.Random(seed)
+    typical = [rng.randrange(30, 240) for _ in range(participants)]
+    start, i, day = date(2020, 1, 1), 0, 0
+    while True:
+        d = (start + timedelta(days=day)).isoformat()
+        for p in range(participants):
+            if rng.random() < 0.15:
+                continue
+            for _ in range(per_day):
+                x = typical[p] * (4 if rng.random() < 0.02 else 1)
+                yield "p%d" % p, {"date": d, "duration": max(0, int(rng.gauss(x, x / 4)) // per_day)}
+                i += 1
+                if i == n:
+                    return
+        day += 1
+
+
+def replay(stream, n, observe, after=None):
+    # ns per event for each tenth of the stream, timing observe() only (not generating
+    # the events or committing them)
+    tenth, out = max(n // 10, 1), []
+    spent, k = 0.0, 0
+    clock = time.perf_counter
+    for uid, log in stream:
+        t0 = clock()
+        observe(uid, log)
+        spent += clock() - t0
+        if after:
+            after()
+        k += 1
+        if k % tenth == 0:
+            out.append(spent / tenth * 1e9)
+            spent = 0.0
+    return out
+
+
+def step_only(args):
+    goals = {"p%d" % p: 120 for p in range(args.participants)}
+    state = {}
+    raised = [0]
+
+    def observe(uid, log):
+        s = state.get(uid)
+        if s is None:
+            s = state[uid] = dict(anomaly.EMPTY)
+        raised[0] += len(anomaly.step(s, log, goals[uid], uid))
+
+    ns = replay(events(args.events, args.participants, args.per_day), args.events, observe)
+    return ns, raised[0]
+
+
+def with_db(args):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = db.connect(path)
+    storage.init(conn)
+    now = "2020-01-01T00:00:00"
+    conn.executemany("INSERT INTO participants (id, progress, version, created_at, updated_at) VALUES (?, 3, 1, ?, ?)",
+                     [("p%d" % p, now, now) for p in range(args.participants)])
+    conn.executemany("INSERT INTO pretest (participant_id, goal_time) VALUES (?, 120)",
+                     [("p%d" % p,) for p in range(args.participants)])
+    conn.commit()
+
+    def observe(uid, log):
+        anomaly.observe(conn, uid, [log])
+
+    ns = replay(events(args.db_events, args.participants, args.per_day), args.db_events, observe, conn.commit)
+    n_flags = conn.execute("SELECT COUNT(*) FROM relapse_flags").fetchone()[0]
+    rebuild_s = None
+    if args.rebuild:
+        rows = ((uid, log["date"], log["duration"]) for uid, log in
+                events(args.db_events, args.participants, args.per_day))
+        with conn:
+            conn.executemany("INSERT INTO logs (participant_id, date, duration) VALUES (?, ?, ?)", rows)
+        t0 = time.perf_counter()
+        anomaly.rebuild(conn)
+        rebuild_s = time.perf_counter() - t0
+        assert conn.execute("SELECT COUNT(*) FROM relapse_flags").fetchone()[0] == n_flags
+    conn.close()
+    return ns, n_flags, rebuild_s
+
+
+def show(label, ns):
+    print("%-8s %s   last/first %.2f" % (label, " ".join("%6.0f" % x for x in ns), ns[-1] / ns[0]))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=2000000, help="events replayed through step()")
+    ap.add_argument("--db-events", type=int, default=200000, help="events replayed through observe() on SQLite")
+    ap.add_argument("--participants", type=int, default=1000)
+    ap.add_argument("--per-day", type=int, default=2, help="logs per participant per logged day")
+    ap.add_argument("--rebuild", action="store_true", help="also time a full anomaly.rebuild() of the same logs")
+    ap.add_argument("--no-record", action="store_true")
+    args = ap.parse_args()
+
+    print("ns/event by tenth of the replay (history grows left to right)")
+    step_ns, step_flags = step_only(args)
+    show("step", step_ns)
+    db_ns, db_flags, rebuild_s = with_db(args)
+    show("observe", db_ns)
+    print("%d flags over %d events in memory, %d over %d on SQLite"
+          % (step_flags, args.events, db_flags, args.db_events))
+    if rebuild_s is not None:
+        print("rebuild of %d logs: %.2fs (%.0f ns/log)" % (args.db_events, rebuild_s, rebuild_s / args.db_events * 1e9))
+
+    if not args.no_record:
+        with open(RESULTS, "a") as f:
+            f.write(json.dumps({"bench": "anomaly", "commit": git_commit(), "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                                "events": args.events, "db_events": args.db_events,
+                                "participants": args.participants, "step_ns": step_ns, "observe_ns": db_ns,
+                                "rebuild_s": rebuild_s}) + "\n")
@@ -0,0 +1,190 @@
+"""Headless load test of app.py with streamlit.testing.v1.AppTest.
+
+Each simulated session enters a Participant ID, fills the Day 1 pre-test,
+tracker and trigger diary, saves, reruns to see the Dashboard and queues an
+email report. Sessions run in parallel worker processes against a temporary
+database; email goes to an in-process SMTP stub, so no network is needed.
+
+    python benchmarks/bench_app.py --workers 4 --sessions 10
+
+Every run appends a line to benchmarks/results.jsonl (tagged with the git
+commit) and fails if p95 rerun latency regressed by more than
+--max-regression against the previous run.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+
+class SMTPStub(socketserver.StreamRequestHandler):
+    # just enough SMTP to accept and discard messages
+    def handle(self):
+        self.wfile.write(b"220 stub\r\n")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line.rstrip(b"\r\n") == b".":
+                    in_data = False
+                    self.wfile.write(b"250 ok\r\n")
+                continue
+            cmd = line[:4].upper()
+            if cmd == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 go\r\n")
+            elif cmd == b"QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            elif cmd == b"EHLO":
+                self.wfile.write(b"250 stub\r\n")
+            else:
+                self.wfile.write(b"250 ok\r\n")
+
+
+def start_smtp_stub():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPStub)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _timed(fn, bucket):
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            bucket[0] += time.perf_counter() - t0
+    return wrapper
+
+
+def worker(args):
+    worker_id, sessions, db_path, smtp_port = args
+    os.environ["SMU_DB"] = db_path
+    sys.path.insert(0, ROOT)
+    os.chdir(tempfile.mkdtemp())
+    from streamlit.testing.v1 import AppTest
+    import repository
+
+    db_time = [0.0]
+    for name in ["summary", "version", "load_versioned", "write"]:
+        setattr(repository.Repository, name, _timed(getattr(repository.Repository, name), db_time))
+
+    reruns, saves = [], 0
+    for i in range(sessions):
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+        at.secrets["RECEIVER_EMAIL"] = "facilitator@example.org"
+        at.secrets["SMTP_HOST"] = "127.0.0.1"
+        at.secrets["SMTP_PORT"] = smtp_port
+        at.secrets["SMTP_SSL"] = "false"
+
+        def rerun(step):
+            db_time[0] = 0.0
+            t0 = time.perf_counter()
+            step.run()
+            total = time.perf_counter() - t0
+            if at.exception:
+                raise RuntimeError(str(at.exception))
+            reruns.append((total, db_time[0]))
+
+        rerun(at)
+        at.sidebar.text_input[0].input("bench-%d-%d" % (worker_id, i))
+        rerun(at)
+        at.number_input(key="day1.pre_screen").set_value(180)
+        at.number_input(key="day1.pre_distract").set_value(25)
+        at.slider(key="day1.pre_sleep").set_value(4)
+        at.text_input(key="day1.pre_cope").input("I put the phone away")
+        rerun(at)
+        labels = {w.label: w for w in at.multiselect}
+        labels["Platforms used most"].select("Instagram").select("TikTok")
+        labels["Why do you use SM?"].select("Boredom")
+        texts = {w.label: w for w in at.text_input}
+        texts["Main trigger (when/where do you use it most?)"].input("In bed")
+        texts["Why did you open it?"].input("Notification")
+        rerun(at)
+        [b for b in at.button if b.label == "Save Day 1"][0].click()
+        rerun(at)
+        saves += 1
+        rerun(at)  # Dashboard now shows the saved log
+        send = [b for b in at.button if b.label == "Send Full Report to Email"]
+        if send:
+            send[0].click()
+            rerun(at)
+    return reruns, saves
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_result(bench="app"):
+    if not os.path.exists(RESULTS):
+        return None
+    with open(RESULTS) as f:
+        runs = [json.loads(l) for l in f if l.strip()]
+    runs = [r for r in runs if r.get("bench", "app") == bench]
+    return runs[-1] if runs else None
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--sessions", type=int, default=10, help="sessions per worker")
+    ap.add_argument("--max-regression", type=float, default=0.25)
+    ap.add_argument("--no-record", action="store_true")
+    args = ap.parse_args()
+
+    smtp = start_smtp_stub()
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    jobs = [(w, args.sessions, db_path, smtp.server_address[1]) for w in range(args.workers)]
+    t0 = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+        results = pool.map(worker, jobs)
+    wall = time.perf_counter() - t0
+
+    totals = [t for r, _ in results for t, _ in r]
+    db_times = [d for r, _ in results for _, d in r]
+    saves = sum(s for _, s in results)
+    result = {
+        "bench": "app",
+        "commit": git_commit(),
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workers": args.workers,
+        "sessions": args.workers * args.sessions,
+        "reruns": len(totals),
+        "p50_ms": pct(totals, 50) * 1000,
+        "p95_ms": pct(totals, 95) * 1000,
+        "p99_ms": pct(totals, 99) * 1000,
+        "db_ms_mean": sum(db_times) / len(db_times) * 1000,
+        "render_ms_mean": (sum(totals) - sum(db_times)) / len(totals) * 1000,
+        "saves_per_sec": saves / wall,
+    }
+    for k, v in result.items():
+        print("%-16s %s" % (k, "%.1f" % v if isinstance(v, float) else v))
+
+    prev = previous_result()
+    if not args.no_record:
+        with open(RESULTS, "a") as f:
+            f.write(json.dumps(result) + "\n")
+    if prev and prev.get("workers") == args.workers and prev["p95_ms"] > 0:
+        change = result["p95_ms"] / prev["p95_ms"] - 1
+        print("p95 vs %s: %+.0f%%" % (prev.get("commit"), change * 100))
+        if change > args.max_regression:
+            sys.exit("p95 rerun latency regressed by more than %.0f%%" % (args.max_regression * 100))
@@ -0,0 +1,123 @@
+"""Size and speed of the binary record format (codec.py) against the JSON it replaced.
+
+Builds participant records shaped like the app's (a Day 1 log with platform,
+reason and consequence lists, then Day 2/3 logs with empty categoricals) at a
+few log counts, and compares encoded size, encode/decode time and the size of
+a snapshots table holding --participants records after VACUUM.
+
+    python benchmarks/bench_codec.py --logs 3 30 300 --participants 2000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import codec  # noqa: E402
+import storage  # noqa: E402
+from bench_app import RESULTS, git_commit  # noqa: E402
+
+APPS = ["Instagram", "TikTok", "Snapchat", "X", "YouTube", "Reddit", "LinkedIn"]
+REASONS = ["Boredom", "FOMO", "Relaxation", "Validation/Likes", "Social connection", "Habit", "Work/Study"]
+CONSEQUENCES = ["Less sleep", "Less focus", "Anxiety", "Wasted time", "Comparison", "Procrastination"]
+
+
+def make_record(n_logs, rng):
+    d = storage.empty()
+    d["progress"] = 3
+    d["pretest"] = {"daily_sm_min": 180, "distractions": 25, "sleep": 4, "life_satisfaction": 5,
+                    "focus": "Rarely", "coping": "I put the phone away", "spare_time": 120, "goal_time": 60}
+    for i in range(n_logs):
+        day1 = i % 3 == 0
+        d["logs"].append({
+            "date": "2026-%02d-%02d" % (1 + i // 28 % 12, 1 + i % 28), "duration": rng.randrange(600),
+            "apps": rng.sample(APPS, 2) if day1 else [], "trigger": rng.choice(["In bed", "Commute", "Lunch"]),
+            "emotion_before": rng.choice(["Bored", "Anxious", "Fine"]) if day1 else "",
+            "emotion_after": rng.choice(["Relaxed", "Empty", "Guilty"]) if day1 else "",
+            "reasons": rng.sample(REASONS, 2) if day1 else [],
+            "consequences": rng.sample(CONSEQUENCES, 1) if day1 else [],
+            "trigger_when": "After class", "trigger_why": "Notification", "trigger_felt": "Tired afterwards"})
+    return d
+
+
+def as_legacy(d):
+    # the pre-codec snapshot: lists in their str() form, then json.dumps
+    return dict(d, logs=[{**log, **{f: str(log[f]) if log[f] else "" for f in codec.LIST_FIELDS}}
+                         for log in d["logs"]])
+
+
+def timed(fn, arg, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def table_bytes(blobs):
+    path = os.path.join(tempfile.mkdtemp(), "snapshots.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE snapshots (participant_id TEXT, data BLOB)")
+    conn.executemany("INSERT INTO snapshots VALUES (?, ?)", (("p%d" % i, b) for i, b in enumerate(blobs)))
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logs", type=int, nargs="+", default=[3, 30, 300])
+    ap.add_argument("--participants", type=int, default=2000, help="records per on-disk comparison")
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--no-record", action="store_true")
+    args = ap.parse_args()
+    rng = random.Random(1)
+
+    rows = []
+    print("%6s %10s %10s %9s %9s %9s %9s %11s %11s" % (
+        "logs", "json B", "codec B", "json enc", "codec enc", "json dec", "codec dec", "json disk", "codec disk"))
+    for n in args.logs:
+        d = make_record(n, rng)
+        legacy = as_legacy(d)
+        j, c = json.dumps(legacy), codec.encode_record(d)
+        assert codec.decode_record(c) == d and codec.decode_record(j) == d
+        records = [make_record(n, rng) for _ in range(min(args.participants, 200000 // max(n, 1)))]
+        row = {
+            "logs": n,
+            "json_bytes": len(j), "codec_bytes": len(c),
+            "json_encode_us": timed(json.dumps, legacy, args.repeat),
+            "codec_encode_us": timed(codec.encode_record, d, args.repeat),
+            "json_decode_us": timed(json.loads, j, args.repeat),
+            "codec_decode_us": timed(codec.decode_record, c, args.repeat),
+            "records_on_disk": len(records),
+            "json_disk_bytes": table_bytes(json.dumps(as_legacy(r)) for r in records),
+            "codec_disk_bytes": table_bytes(codec.encode_record(r) for r in records),
+        }
+        rows.append(row)
+        print("%6d %10d %10d %8.1fus %8.1fus %8.1fus %8.1fus %10.0fK %10.0fK" % (
+            n, row["json_bytes"], row["codec_bytes"], row["json_encode_us"], row["codec_encode_us"],
+            row["json_decode_us"], row["codec_decode_us"], row["json_disk_bytes"] / 1024,
+            row["codec_disk_bytes"] / 1024))
+
+    # what every save writes to the event log
+    log = make_record(1, rng)["logs"][0]
+    event = {"progress": 1, "log": log, "pretest": make_record(0, rng)["pretest"], "day3": None}
+    legacy_event = dict(event, log=as_legacy({"logs": [log]})["logs"][0])
+    j, c = json.dumps(legacy_event), codec.encode_event(event)
+    events = {"json_bytes": len(j), "codec_bytes": len(c),
+              "json_encode_us": timed(json.dumps, legacy_event, args.repeat),
+              "codec_encode_us": timed(codec.encode_event, event, args.repeat),
+              "json_decode_us": timed(json.loads, j, args.repeat),
+              "codec_decode_us": timed(codec.decode_event, c, args.repeat)}
+    print("%6s %10d %10d %8.1fus %8.1fus %8.1fus %8.1fus" % (
+        "event", len(j), len(c), events["json_encode_us"], events["codec_encode_us"],
+        events["json_decode_us"], events["codec_decode_us"]))
+
+    if not args.no_record:
+        with open(RESULTS, "a") as f:
+            f.write(json.dumps({"bench": "codec", "commit": git_commit(), "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                                "runs": rows, "event": events}) + "\n")
@@ -0,0 +1,82 @@
+"""Saves/sec sustained by N simulated concurrent sessions.
+
+Compares the old pattern (fresh rollback-journal connection per save) with the
+shared WAL reader/writer manager in db.py.
+
+    python benchmarks/bench_db_contention.py --sessions 1 8 32 --seconds 3
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import storage
+import db
+
+
+def log_entry(i):
+    return {"date": str(date.today()), "duration": i % 600, "apps": "['Instagram']", "trigger": "bench",
+            "emotion_before": "Bored", "emotion_after": "Fine", "reasons": "['Habit']",
+            "consequences": "[]", "trigger_when": "", "trigger_why": "", "trigger_felt": ""}
+
+
+def naive_session(path, uid, stop, counts, errors):
+    i = 0
+    while not stop.is_set():
+        try:
+            conn = sqlite3.connect(path, timeout=0.1)
+            storage.load(conn, uid)
+            storage.submit(conn, uid, 1, log=log_entry(i))
+            conn.close()
+            counts[uid] = counts.get(uid, 0) + 1
+        except sqlite3.OperationalError:
+            errors.append(uid)
+        i += 1
+
+
+def pooled_session(path, uid, stop, counts, errors):
+    w = db.writer(path)
+    i = 0
+    while not stop.is_set():
+        try:
+            storage.load(db.reader(path), uid)
+            w.submit(storage.submit, uid, 1, log=log_entry(i)).result()
+            counts[uid] = counts.get(uid, 0) + 1
+        except sqlite3.OperationalError:
+            errors.append(uid)
+        i += 1
+
+
+def run(mode, sessions, seconds):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = sqlite3.connect(path)
+    storage.init(conn)
+    conn.close()
+    target = naive_session if mode == "naive" else pooled_session
+    stop, counts, errors = threading.Event(), {}, []
+    threads = [threading.Thread(target=target, args=(path, "p%d" % i, stop, counts, errors))
+               for i in range(sessions)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(counts.values()) / seconds, len(errors)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16, 64])
+    ap.add_argument("--seconds", type=float, default=3.0)
+    args = ap.parse_args()
+    print("%-8s %8s %12s %8s" % ("mode", "sessions", "saves/sec", "locked"))
+    for n in args.sessions:
+        for mode in ("naive", "pooled"):
+            rate, errs = run(mode, n, args.seconds)
+            print("%-8s %8d %12.0f %8d" % (mode, n, rate, errs))
@@ -0,0 +1,129 @@
+"""Multi-process throughput of the shared repository and participant cache.
+
+N worker processes stand in for N Streamlit servers behind a load balancer:
+each runs the app's per-rerun data access (cached record + summary, and a
+save for --write-ratio of the reruns) against one shared backend, with the
+cross-process invalidation channel running. Afterwards worker 0 saves a probe
+record and the others report how long their cache took to see it.
+
+    python benchmarks/bench_multiworker.py --workers 1,2,4 --seconds 5
+    python benchmarks/bench_multiworker.py --url postgresql://localhost/smu
+
+Results are appended to benchmarks/results.jsonl as {"bench": "multiworker"}.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench_app import RESULTS, git_commit, pct  # noqa: E402
+
+
+def log_entry(i):
+    return {"date": "2026-%02d-%02d" % (1 + i % 12, 1 + i % 28), "duration": 30 + i % 300,
+            "apps": ["Instagram", "TikTok"], "trigger": "bench"}
+
+
+def worker(wid, url, seconds, write_ratio, participants, probe, barrier, probe_at, out):
+    os.environ["SMU_DATABASE_URL"] = url
+    import cache
+    cache.participants.watch()
+    rng = random.Random(wid)
+    cache.participants.get(probe)
+    barrier.wait()
+
+    latencies, writes = [], 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        uid = "bench-%d" % rng.randrange(participants)
+        t0 = time.perf_counter()
+        if rng.random() < write_ratio:
+            cache.participants.submit(uid, 1, log=log_entry(writes))
+            writes += 1
+        cache.participants.get(uid)
+        cache.participants.summary(uid)
+        latencies.append(time.perf_counter() - t0)
+
+    barrier.wait()
+    lag = None
+    if wid == 0:
+        time.sleep(0.2)
+        probe_at.value = time.time()
+        cache.participants.submit(probe, 1)
+    else:
+        deadline = time.time() + 10
+        while cache.participants.version(probe) < 1 and time.time() < deadline:
+            time.sleep(0.005)
+        lag = time.time() - probe_at.value
+    out.put({"ops": len(latencies), "writes": writes, "latencies": latencies, "lag": lag,
+             "cache": cache.participants.stats()})
+
+
+def run(n, url, args):
+    ctx = multiprocessing.get_context("spawn")
+    barrier, probe_at, out = ctx.Barrier(n), ctx.Value("d", 0.0), ctx.Queue()
+    probe = "probe-%d" % time.time_ns()
+    procs = [ctx.Process(target=worker, args=(w, url, args.seconds, args.write_ratio, args.participants, probe,
+                                              barrier, probe_at, out)) for w in range(n)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    latencies = [t for r in results for t in r["latencies"]]
+    lags = [r["lag"] for r in results if r["lag"] is not None]
+    return {
+        "workers": n,
+        "ops_per_sec": sum(r["ops"] for r in results) / args.seconds,
+        "saves_per_sec": sum(r["writes"] for r in results) / args.seconds,
+        "p50_ms": pct(latencies, 50) * 1000,
+        "p95_ms": pct(latencies, 95) * 1000,
+        "invalidation_lag_ms": max(lags) * 1000 if lags else None,
+        "cache_hits": sum(r["cache"]["hits"] for r in results),
+        "cache_expirations": sum(r["cache"]["expirations"] for r in results),
+    }
+
+
+def seed(url, participants):
+    import repository
+    repo = repository.get(url)
+    for i in range(participants):
+        repo.submit("bench-%d" % i, 1, log=log_entry(i))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--write-ratio", type=float, default=0.05)
+    ap.add_argument("--participants", type=int, default=200)
+    ap.add_argument("--url", default=None, help="shared backend (default: a fresh SQLite file per run)")
+    ap.add_argument("--no-record", action="store_true")
+    args = ap.parse_args()
+
+    rows = []
+    for n in [int(x) for x in args.workers.split(",")]:
+        url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+        seed(url, args.participants)
+        rows.append(run(n, url, args))
+        r = rows[-1]
+        print("%2d workers  %8.0f ops/s  %6.1f saves/s  p50 %.2f ms  p95 %.2f ms  lag %s" % (
+            n, r["ops_per_sec"], r["saves_per_sec"], r["p50_ms"], r["p95_ms"],
+            "%.0f ms" % r["invalidation_lag_ms"] if r["invalidation_lag_ms"] is not None else "-"))
+    base = rows[0]["ops_per_sec"] / rows[0]["workers"]
+    for r in rows:
+        r["scaling"] = r["ops_per_sec"] / (base * r["workers"])
+    print("scaling efficiency:", ", ".join("%d→%.2f" % (r["workers"], r["scaling"]) for r in rows),
+          "(%d CPUs)" % os.cpu_count())
+
+    if not args.no_record:
+        result = {"bench": "multiworker", "commit": git_commit(), "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "backend": (args.url or "sqlite").split(":", 1)[0], "cpus": os.cpu_count(),
+                  "seconds": args.seconds, "write_ratio": args.write_ratio, "runs": rows}
+        with open(RESULTS, "a") as f:
+            f.write(json.dumps(result) + "\n")
@@ -0,0 +1,97 @@
+"""Cold start: time-to-first-render of app.py for an Overview-only visitor.
+
+Each repetition runs a fresh interpreter under `python -X importtime`, renders
+app.py once with AppTest (no Participant ID) and reports the wall time, the
+heaviest imports and whether rendering pulled in any lazily-loaded module
+(pandas, plotly figures, numpy, smtplib, email.mime). Fails if it did, or if
+time to first render regressed by more than --max-regression against the
+previous recorded run.
+
+    python benchmarks/bench_startup.py --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_app import ROOT, RESULTS, git_commit, previous_result
+
+LAZY_MODULES = ["pandas", "plotly.graph_objects", "plotly.express", "numpy", "smtplib", "email.mime.multipart",
+                "pyarrow"]
+
+
+def child():
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    t_streamlit = time.perf_counter()
+    # streamlit may preload some of these itself; only count what rendering the app adds
+    preloaded = {m for m in LAZY_MODULES if m in sys.modules}
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60).run()
+    t_render = time.perf_counter()
+    if at.exception:
+        raise SystemExit(str(at.exception))
+    print(json.dumps({"streamlit_s": t_streamlit - t0, "first_render_s": t_render - t_streamlit,
+                      "total_s": t_render - t0, "loaded": [m for m in LAZY_MODULES if m in sys.modules and m not in preloaded]}))
+
+
+def parse_importtime(stderr):
+    # "import time: self [us] | cumulative | imported package"
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = [p.strip() for p in line.replace("import time:", "").split("|")]
+        top.append((int(cum_us), name))
+    return top
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+        sys.exit()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-regression", type=float, default=0.25)
+    ap.add_argument("--no-record", action="store_true")
+    args = ap.parse_args()
+
+    runs, imports = [], []
+    env = dict(os.environ, SMU_DB=os.path.join(tempfile.mkdtemp(), "startup.db"))
+    for _ in range(args.repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child"],
+                              capture_output=True, text=True, env=env, cwd=tempfile.mkdtemp())
+        if proc.returncode:
+            sys.exit(proc.stdout + proc.stderr[-2000:])
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        imports = parse_importtime(proc.stderr)
+
+    best = min(runs, key=lambda r: r["total_s"])
+    app_modules = [(us, name) for us, name in imports
+                   if os.path.exists(os.path.join(ROOT, name.split(".")[0] + ".py"))]
+    print("best cold start %.0f ms (streamlit import %.0f ms, first render %.0f ms)"
+          % (best["total_s"] * 1000, best["streamlit_s"] * 1000, best["first_render_s"] * 1000))
+    print("heaviest imports (cumulative ms):")
+    for us, name in sorted(imports, reverse=True)[:10]:
+        print("  %8.1f  %s" % (us / 1000, name))
+    print("app modules (cumulative ms):")
+    for us, name in sorted(app_modules, reverse=True):
+        print("  %8.1f  %s" % (us / 1000, name))
+
+    result = {"bench": "startup", "commit": git_commit(), "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "cold_ms": best["total_s"] * 1000, "first_render_ms": best["first_render_s"] * 1000,
+              "lazy_loaded": best["loaded"]}
+    prev = previous_result("startup")
+    if not args.no_record:
+        with open(RESULTS, "a") as f:
+            f.write(json.dumps(result) + "\n")
+    if best["loaded"]:
+        sys.exit("Overview render imported lazily-loaded modules: " + ", ".join(best["loaded"]))
+    if prev and prev["first_render_ms"] > 0:
+        change = result["first_render_ms"] / prev["first_render_ms"] - 1
+        print("first render vs %s: %+.0f%%" % (prev.get("commit"), change * 100))
+        if change > args.max_regression:
+            sys.exit("time to first render regressed by more than %.0f%%" % (args.max_regression * 100))
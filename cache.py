@@ -0,0 +1,137 @@
+import threading
+import time
+import copy
+from collections import OrderedDict
+import storage
+import repository
+
+MAX_PARTICIPANTS = 512
+REVALIDATE_SECONDS = 2.0
+WATCHED_REVALIDATE_SECONDS = 30.0
+
+
+class LRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+
+    def get(self, key):
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        evicted = 0
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def pop(self, key):
+        return self.items.pop(key, None)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class ParticipantCache:
+    # Records are trusted for REVALIDATE_SECONDS; after that a hit costs one
+    # indexed SELECT of participants.version, so writes from other processes
+    # are picked up without re-reading the whole record. With watch() running,
+    # saves from other processes expire entries as they commit and the version
+    # check only backs up a missed notification.
+
+    def __init__(self, maxsize=MAX_PARTICIPANTS, revalidate=REVALIDATE_SECONDS, clock=time.monotonic, repo=None):
+        self.lru = LRU(maxsize)
+        self.revalidate = revalidate
+        self.clock = clock
+        self.repo = repo
+        self.watcher = None
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.revalidations = self.evictions = self.expirations = 0
+
+    def _repo(self):
+        if self.repo is None:
+            self.repo = repository.get()
+        return self.repo
+
+    def _entry(self, uid):
+        now = self.clock()
+        with self.lock:
+            entry = self.lru.get(uid)
+            if entry and now - entry["checked"] < self.revalidate:
+                self.hits += 1
+                return entry
+        if entry:
+            v = self._repo().version(uid)
+            with self.lock:
+                self.revalidations += 1
+                if v == entry["version"]:
+                    entry["checked"] = now
+                    self.hits += 1
+                    return entry
+        data, v = self._repo().load_versioned(uid)
+        entry = {"data": data, "summary": self._repo().summary(uid), "version": v, "checked": now}
+        with self.lock:
+            self.misses += 1
+            self.evictions += self.lru.put(uid, entry)
+        return entry
+
+    def get(self, uid):
+        return copy.deepcopy(self._entry(uid)["data"])
+
+    def summary(self, uid):
+        return dict(self._entry(uid)["summary"])
+
+    def version(self, uid):
+        return self._entry(uid)["version"]
+
+    def submit(self, uid, progress, log=None, pretest=None, day3=None, draft=None):
+        v = self._repo().submit(uid, progress, log=log, pretest=pretest, day3=day3, draft=draft)
+        with self.lock:
+            entry = self.lru.get(uid)
+            if entry and entry["version"] == v - 1:
+                storage.apply(entry["data"], progress, log=log, pretest=pretest, day3=day3)
+                entry["summary"] = self._repo().summary(uid)
+                entry["version"] = v
+                entry["checked"] = self.clock()
+            elif entry:
+                # someone else wrote in between, the next get() reloads
+                self.lru.pop(uid)
+        return v
+
+    def invalidate(self, uid):
+        with self.lock:
+            self.lru.pop(uid)
+
+    def expire(self, uid):
+        # force a version check on next access; our own write-through entries pass it
+        with self.lock:
+            entry = self.lru.items.get(uid)
+            if entry:
+                entry["checked"] = float("-inf")
+                self.expirations += 1
+
+    def expire_all(self):
+        with self.lock:
+            for entry in self.lru.items.values():
+                entry["checked"] = float("-inf")
+
+    def watch(self):
+        # subscribe to saves from every process sharing the backend
+        with self.lock:
+            if self.watcher is None:
+                self.watcher = repository.Watcher(self.expire, self._repo(), self.expire_all).start()
+                self.revalidate = max(self.revalidate, WATCHED_REVALIDATE_SECONDS)
+        return self.watcher
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "revalidations": self.revalidations,
+                    "evictions": self.evictions, "expirations": self.expirations, "size": len(self.lru)}
+
+
+participants = ParticipantCache()
@@ -0,0 +1,90 @@
+import threading
+from datetime import date, timedelta
+from cache import LRU
+
+POINT_BUDGET = 500
+CACHE_SIZE = 256
+
+_figures = LRU(CACHE_SIZE)
+_lock = threading.Lock()
+
+
+def _cached(key, build):
+    with _lock:
+        fig = _figures.get(key)
+    if fig is None:
+        fig = build()
+        with _lock:
+            _figures.put(key, fig)
+    return fig
+
+
+def bucket_logs(logs, bucket="day"):
+    # mean duration per day, or per ISO week (labelled by its Monday)
+    sums, counts = {}, {}
+    for log in logs:
+        if log.get("duration") is None or not log.get("date"):
+            continue
+        key = log["date"][:10]
+        if bucket == "week":
+            d = date.fromisoformat(key)
+            key = (d - timedelta(days=d.weekday())).isoformat()
+        sums[key] = sums.get(key, 0) + log["duration"]
+        counts[key] = counts.get(key, 0) + 1
+    keys = sorted(sums)
+    return keys, [sums[k] / counts[k] for k in keys]
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: returns indices of the points to keep
+    import numpy as np
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def usage_series(logs, budget=POINT_BUDGET):
+    dates, values = bucket_logs(logs, "day")
+    if len(dates) > budget * 4:
+        dates, values = bucket_logs(logs, "week")
+    if len(dates) > budget:
+        ordinals = [date.fromisoformat(d).toordinal() for d in dates]
+        idx = lttb(ordinals, values, budget)
+        dates, values = [dates[i] for i in idx], [values[i] for i in idx]
+    return dates, values
+
+
+def usage_figure(uid, version, logs, title="Daily SMU Trend — Target: Decreasing", budget=POINT_BUDGET):
+    def build():
+        import plotly.graph_objects as go
+        x, y = usage_series(logs, budget)
+        fig = go.Figure(go.Scatter(x=x, y=y, mode="lines", name="duration"))
+        fig.update_layout(title=title, xaxis_title="date", yaxis_title="duration")
+        return fig
+    return _cached(("usage", uid, version, title, budget), build)
+
+
+def prepost_figure(before, after, title="Pre vs Post Training Comparison"):
+    # before/after: {metric label: value}
+    def build():
+        import plotly.graph_objects as go
+        labels = list(before)
+        fig = go.Figure([go.Bar(name="Before", x=labels, y=[before[k] for k in labels]),
+                         go.Bar(name="After", x=labels, y=[after[k] for k in labels])])
+        fig.update_layout(barmode="group", title=title, xaxis_title="Metric", yaxis_title="value")
+        return fig
+    return _cached(("prepost", title, tuple(before.items()), tuple(after.items())), build)
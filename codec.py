@@ -0,0 +1,226 @@
+import ast
+import json
+import struct
+import sys
+import zlib
+from array import array
+from itertools import repeat
+
+# Frame: b"SMU" + version byte + flags byte + (optionally zlib'd) body. Logs are
+# stored as columns (struct-of-arrays); string columns holding enum options or
+# repeated text are int32 codes into ENUM_V1 followed by the blob's own vocabulary,
+# so categoricals cost four bytes before compression and repeated text is stored
+# once. One-off free text stays in the JSON header. Rows written before the format
+# existed are plain JSON text and still decode.
+
+MAGIC = b"SMU"
+VERSION = 1
+ZLIB = 0x01
+COMPRESS_MIN = 96
+COMPRESS_LEVEL = 6
+LIST_FIELDS = ["apps", "reasons", "consequences"]
+
+# frozen for VERSION 1: new options are fine (they go into the per-blob vocabulary),
+# but reordering or removing entries needs a new version
+ENUM_V1 = (
+    "",
+    "Instagram", "TikTok", "Snapchat", "X", "YouTube", "Reddit", "LinkedIn", "Facebook", "WhatsApp",
+    "Boredom", "FOMO", "Relaxation", "Validation/Likes", "Social connection", "Habit", "Work/Study",
+    "Bored", "Anxious", "Lonely", "Fine", "Stressed", "Curious",
+    "Relaxed", "Empty", "Distracted", "Guilty",
+    "Less sleep", "Less focus", "Anxiety", "Wasted time", "Comparison", "Procrastination",
+    "Never", "Rarely", "Sometimes", "Often", "Always",
+    "No", "A little", "Yes", "Definitely",
+)
+_ENUM_CODES = {v: i for i, v in enumerate(ENUM_V1)}
+
+RAW, CODED, CODED_LIST = 0, 1, 2
+_STR, _TEXT, _LIST = {str}, {str, type(None)}, {list}
+
+
+def parse_list(v):
+    # log lists arrive as real lists, JSON text, the legacy str() form or empty
+    if isinstance(v, list):
+        return list(v)
+    if not v:
+        return []
+    if isinstance(v, str) and v[0] == "[":
+        try:
+            return json.loads(v)
+        except ValueError:
+            try:
+                parsed = ast.literal_eval(v)
+            except (ValueError, SyntaxError):
+                parsed = None
+            if isinstance(parsed, list):
+                return parsed
+    return [v]
+
+
+def list_text(v):
+    # column form of a log list: JSON text, NULL when empty
+    items = parse_list(v)
+    return json.dumps(items, ensure_ascii=False) if items else None
+
+
+# ── COLUMNS ───────────────────────────────────────────
+
+class _Vocab(dict):
+    # string -> code: ENUM_V1 first, None is -1, anything else gets the next free code
+    def __init__(self):
+        super().__init__(_ENUM_CODES)
+        self[None] = -1
+
+    def __missing__(self, s):
+        c = self[s] = len(self) - 1
+        return c
+
+    def extra(self):
+        return list(self)[len(ENUM_V1) + 1:]
+
+
+def _strings(extra):
+    return ENUM_V1 + tuple(extra) + (None,)
+
+
+def _codes(values):
+    a = array("i", values)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tobytes()
+
+
+def _read_codes(buf, pos, n):
+    a = array("i")
+    a.frombytes(buf[pos:pos + 4 * n])
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tolist(), pos + 4 * n
+
+
+def _worth_coding(values):
+    # coding only pays off for enum values or text that repeats; one-off free text is
+    # cheaper to keep in the JSON header, where json.loads decodes it in C
+    return not _ENUM_CODES.keys().isdisjoint(values) or len(set(values)) < len(values)
+
+
+def _columns(rows, vocab, buf):
+    # coded columns go to buf as little-endian int32 arrays (a list column as its lengths,
+    # then the flattened codes); raw columns stay in the JSON header
+    code = vocab.__getitem__
+    cols = []
+    names = dict.fromkeys(rows[0]) if rows else {}
+    if any(row.keys() != names.keys() for row in rows):
+        names = dict.fromkeys(k for row in rows for k in row)
+    for name in names:
+        values = [row.get(name) for row in rows]
+        types = set(map(type, values))
+        if types <= _TEXT:
+            if _worth_coding(values):
+                buf += _codes(map(code, values))
+                cols.append([name, CODED])
+                continue
+        elif types == _LIST:
+            flat = [x for v in values for x in v]
+            if set(map(type, flat)) <= _STR and _worth_coding(flat):
+                buf += _codes(map(len, values))
+                buf += _codes(map(code, flat))
+                cols.append([name, CODED_LIST, len(flat)])
+                continue
+        cols.append([name, RAW, values])
+    return [len(rows), cols]
+
+
+def _rows(table, strings, buf, pos):
+    n, cols = table
+    if not cols:
+        return [{} for _ in range(n)], pos
+    lookup = strings.__getitem__
+    names, data = [], []
+    for col in cols:
+        if col[1] == CODED:
+            codes, pos = _read_codes(buf, pos, n)
+            values = list(map(lookup, codes))
+        elif col[1] == CODED_LIST:
+            lengths, pos = _read_codes(buf, pos, n)
+            codes, pos = _read_codes(buf, pos, col[2])
+            flat = list(map(lookup, codes))
+            values, i = [], 0
+            for k in lengths:
+                values.append(flat[i:i + k])
+                i += k
+        else:
+            values = col[2]
+        names.append(col[0])
+        data.append(values)
+    return list(map(dict, map(zip, repeat(names), zip(*data)))), pos
+
+
+# ── FRAMES ────────────────────────────────────────────
+
+def _frame(header, buf=b""):
+    # body: uint32 header length, JSON header, binary column data
+    head = json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode()
+    raw = struct.pack("<I", len(head)) + head + buf
+    if len(raw) >= COMPRESS_MIN:
+        # a window and hash table sized to the input: zlib's defaults (32K window, 64K hash)
+        # cost more to set up than compressing a one-log event; decompress() reads any window
+        wbits = min(15, max(9, (len(raw) - 1).bit_length()))
+        z = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, wbits, min(8, max(1, wbits - 7)))
+        packed = z.compress(raw) + z.flush()
+        if len(packed) < len(raw):
+            return MAGIC + bytes((VERSION, ZLIB)) + packed
+    return MAGIC + bytes((VERSION, 0)) + raw
+
+
+def is_legacy(blob):
+    return isinstance(blob, str) or bytes(blob[:3]) != MAGIC
+
+
+def _unframe(blob):
+    blob = bytes(blob)
+    if blob[3] != VERSION:
+        raise ValueError("unsupported record format version %d" % blob[3])
+    body = blob[5:]
+    if blob[4] & ZLIB:
+        body = zlib.decompress(body)
+    n = struct.unpack_from("<I", body)[0]
+    return json.loads(body[4:4 + n]), memoryview(body), 4 + n
+
+
+def encode_record(d):
+    vocab, buf = _Vocab(), bytearray()
+    logs = _columns(d["logs"], vocab, buf)
+    day2 = _columns(d.get("day2_logs", []), vocab, buf)
+    return _frame(["r", vocab.extra(), d["progress"], d["pretest"], d["day3"], logs, day2], buf)
+
+
+def decode_record(blob):
+    if is_legacy(blob):
+        d = json.loads(blob)
+        for log in d["logs"]:
+            for f in LIST_FIELDS:
+                if f in log:
+                    log[f] = parse_list(log[f])
+        return d
+    (_, extra, progress, pretest, day3, logs, day2), buf, pos = _unframe(blob)
+    strings = _strings(extra)
+    logs, pos = _rows(logs, strings, buf, pos)
+    day2, pos = _rows(day2, strings, buf, pos)
+    return {"progress": progress, "logs": logs, "pretest": pretest, "day2_logs": day2, "day3": day3}
+
+
+def encode_event(payload):
+    vocab, buf = _Vocab(), bytearray()
+    log = payload.get("log")
+    table = _columns([log], vocab, buf) if log is not None else None
+    return _frame(["e", vocab.extra(), payload["progress"], table, payload.get("pretest"), payload.get("day3")],
+                  buf)
+
+
+def decode_event(blob):
+    if is_legacy(blob):
+        return json.loads(blob)
+    (_, extra, progress, table, pretest, day3), buf, pos = _unframe(blob)
+    log = _rows(table, _strings(extra), buf, pos)[0][0] if table is not None else None
+    return {"progress": progress, "log": log, "pretest": pretest, "day3": day3}
@@ -0,0 +1,101 @@
+# Static page text, assembled once at import so reruns only ship ready-made markdown.
+
+COURSE_NAME = "Applications of Psychology in Society (Work, Health and Education)"
+MODULE_NAME = "Application of Psychology in Society - Work C"
+AFFILIATION = "Leuphana university"
+FACILITATORS = [
+    "Anna Redvanska",
+    "Ezzat Bachour",
+    "Maja Gabriel-Węglowska",
+    "Karolina Kozłowska"
+]
+
+OVERVIEW_INTRO = "\n\n".join([
+    f"**Module:** {MODULE_NAME}",
+    f"**Course:** {COURSE_NAME}",
+    "**Facilitators:** " + ", ".join(FACILITATORS),
+    "---",
+    "**Target:** Young adults and students with problematic social media use",
+    "**Duration:** 14 days — 3 online sessions + individual work",
+    "**Theory:** Action Regulation Theory — moving from automatic to intentional behavior",
+])
+
+IMPACTS = [
+    ("error", "Emotional Impact", "Anxiety, stress, emotional exhaustion, low well-being"),
+    ("warning", "Cognitive Impact", "Attention deficit, FOMO, cognitive decline, memory issues"),
+    ("info", "Behavioral Impact", "Sleep disruption, procrastination, diminished performance"),
+]
+
+PROGRAM_GOAL = "Move from uncontrolled, excessive SMU → intentional, reduced, disciplined usage"
+
+GOALS = [
+    "Screen time reduced to 1-2 hrs/day leisure",
+    "Fewer distractions during daily tasks",
+    "Better sleep quality",
+    "Stronger ability to resist urges",
+    "Higher life satisfaction",
+    "Better self-esteem and emotional coping"
+]
+GOALS_MD = "\n".join("- " + g for g in GOALS)
+
+SIDEBAR_COURSE = f"**Course:**<br>{COURSE_NAME}"
+SIDEBAR_FACILITATORS = "**Facilitators:**<br>" + "<br>".join(FACILITATORS)
+
+WHAT_IS_SMU = """
+**SMU** = Social Media Usage. **PSMU** = Problematic SMU — a self-regulation issue, NOT a willpower problem.
+
+**Why is social media addictive?**
+- Dopamine release + variable rewards (like a slot machine)
+- Every like, comment, notification = unpredictable reward
+
+**Key Models explaining PSMU:**
+- **I-PACE Model** — Interaction of Person, Affect, Cognition, Execution
+- **Self-Regulation Failure** (Baumeister) — goal pursuit breaks down under stress
+- **Dual-Process Model** (Kahneman) — automatic (fast) vs deliberate (slow) thinking
+- **Action Regulation Theory** (Hacker) — behavior regulated by goal-setting and monitoring
+- **Classical & Operant Conditioning** — habitual triggers reinforced over time
+
+**Harms:** Attention deficit, sleep disruption, anxiety, low self-esteem, FOMO, body image concerns
+"""
+
+DAY2_CONCEPTS = """
+**Triggers:**
+- Internal: Boredom, FOMO, anxiety, need for validation
+- External: Notifications, seeing others on phones, environmental cues
+
+**Urge Curve:**
+Urges rise quickly, peak around 10 min, then naturally drop — you don't have to act on them.
+
+**Delay-and-Decide Principle:** Wait 10 minutes before opening SM. Ask yourself:
+- "What do I expect from opening this app?"
+- "What usually happens after 10 minutes of scrolling?"
+
+**Intentional vs Automatic Use:**
+- Automatic = habit-driven, no conscious choice
+- Intentional = deliberate, time-limited, purpose-driven
+
+**Emotional Regulation Tools:**
+- Emotional tolerance — sit with discomfort without reacting
+- If-Then plans — "IF I feel bored, THEN I will go for a walk"
+- Cognitive reappraisal — reframe the urge
+"""
+
+DAY3_CONCEPTS = """
+**Lapse vs Relapse:**
+- Lapse = one slip (normal, expected)
+- Relapse = return to old patterns (preventable)
+- One bad day does NOT mean failure — self-compassion is key
+
+**Identity & Values Alignment:**
+Maintenance is not just behavioral — it's motivational.
+Ask: "Who do I want to be? Does this SM habit serve that person?"
+
+**Handling Challenges:**
+- Social pressure: It's okay to be present without your phone
+- Boredom in social contexts: Reconnect with face-to-face interaction
+- Work/study: Define what counts as necessary SM use
+
+**Personal SMU Rules (be specific):**
+Define: WHEN, HOW LONG, FOR WHAT PURPOSE
+Example: "I use Instagram only after 7pm, max 20 min, to message friends — not to scroll."
+"""
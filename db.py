@@ -0,0 +1,126 @@
+import sqlite3
+import threading
+import queue
+import atexit
+import os
+import weakref
+from concurrent.futures import Future
+import storage
+import instrument
+
+DB_PATH = os.environ.get("SMU_DB", storage.DB_PATH)
+BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_ready = set()
+_writers = {}
+_idle = {}
+
+
+def connect(path=None):
+    path = path or DB_PATH
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                           cached_statements=CACHED_STATEMENTS)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=%d" % BUSY_TIMEOUT_MS)
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.set_trace_callback(_trace)
+    return conn
+
+
+def _trace(sql):
+    instrument.count("db_queries")
+
+
+def ensure_schema(path):
+    if path in _ready:
+        return
+    with _init_lock:
+        if path in _ready:
+            return
+        conn = connect(path)
+        storage.init(conn)
+        storage.migrate_legacy(conn)
+        conn.close()
+        _ready.add(path)
+
+
+def reader(path=None):
+    # one connection per thread, taken from and returned to a per-path pool: Streamlit runs
+    # every rerun on a fresh thread, so the pool is what keeps connections and their
+    # statement caches alive from one rerun to the next
+    path = path or DB_PATH
+    ensure_schema(path)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    if path not in conns:
+        idle = _idle.setdefault(path, [])
+        try:
+            conn = idle.pop()
+        except IndexError:
+            conn = connect(path)
+        conns[path] = conn
+        weakref.finalize(threading.current_thread(), idle.append, conn)
+    return conns[path]
+
+
+class Writer:
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="smu-db-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        conn = connect(self.path)
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            fn, args, kwargs, fut, record = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                with instrument.attached(record):
+                    fut.set_result(fn(conn, *args, **kwargs))
+            except BaseException as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                fut.set_exception(e)
+        conn.close()
+
+    def submit(self, fn, *args, **kwargs):
+        fut = Future()
+        self.queue.put((fn, args, kwargs, fut, instrument.current()))
+        return fut
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+def writer(path=None):
+    path = path or DB_PATH
+    ensure_schema(path)
+    with _init_lock:
+        if path not in _writers:
+            _writers[path] = Writer(path)
+        return _writers[path]
+
+
+def write(fn, *args, **kwargs):
+    # every write in this process goes through a single writer thread and connection
+    instrument.count("db_writes")
+    with instrument.span("db.write"):
+        return writer().submit(fn, *args, **kwargs).result()
+
+
+@atexit.register
+def _shutdown():
+    for w in list(_writers.values()):
+        w.stop()
+    _writers.clear()
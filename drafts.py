@@ -0,0 +1,60 @@
+import time
+import streamlit as st
+import storage
+import repository
+
+# In-progress answers of the Day 1-3 forms. Widgets keep their values in
+# st.session_state under "<form>.<field>" keys; the drafts table only sees them
+# every DEBOUNCE_SECONDS or when the participant switches tabs, and a new session
+# (reconnect, reload, another device) starts from the saved draft.
+
+DEBOUNCE_SECONDS = 10.0
+STATE = "_drafts"
+
+
+def _values(form):
+    prefix = form + "."
+    return {k[len(prefix):]: v for k, v in st.session_state.items() if isinstance(k, str) and k.startswith(prefix)}
+
+
+def restore(uid, form, defaults):
+    # call before the form's widgets, which take their initial values from here (no value= of their own);
+    # reads the draft once per session and participant, or again if Streamlit dropped the widgets' state
+    state = st.session_state.setdefault(STATE, {})
+    entry = state.get(form)
+    if entry is None or entry["uid"] != uid or any(form + "." + f not in st.session_state for f in defaults):
+        saved = storage.draft(repository.get().reader(), uid, form) or {}
+        for field, value in defaults.items():
+            st.session_state[form + "." + field] = saved.get(field, value)
+        state[form] = {"uid": uid, "saved": _values(form), "at": None, "written": time.monotonic()}
+
+
+def flush(uid, min_age=0.0):
+    # persist every form whose values changed since the last write at least min_age seconds ago
+    n = 0
+    now = time.monotonic()
+    for form, entry in st.session_state.get(STATE, {}).items():
+        if entry["uid"] != uid or now - entry["written"] < min_age:
+            continue
+        values = _values(form)
+        if values != entry["saved"]:
+            repository.get().write(storage.save_draft, uid, form, values)
+            entry.update(saved=values, at=time.strftime("%H:%M:%S"), written=now)
+            n += 1
+    return n
+
+
+def submitted(form):
+    # the submit removed the stored draft; what's on screen now counts as saved
+    entry = st.session_state.get(STATE, {}).get(form)
+    if entry is not None:
+        entry.update(saved=_values(form), at=None, written=time.monotonic())
+
+
+@st.fragment(run_every=DEBOUNCE_SECONDS)
+def autosave(uid):
+    # also runs on every full rerun, hence the age check
+    flush(uid, DEBOUNCE_SECONDS)
+    times = [e["at"] for e in st.session_state.get(STATE, {}).values() if e["uid"] == uid and e["at"]]
+    if times:
+        st.caption("Draft saved at " + max(times))
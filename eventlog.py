@@ -0,0 +1,113 @@
+import threading
+from datetime import datetime
+import storage
+import codec
+import instrument
+import repository
+
+COMPACT_EVERY = 20
+KEEP_SNAPSHOTS = 2
+COMPACT_INTERVAL = 30.0
+
+
+def _snapshot(conn, uid, as_of_event=None):
+    q = "SELECT last_event_id, data FROM snapshots WHERE participant_id=?"
+    args = [uid]
+    if as_of_event is not None:
+        q += " AND last_event_id<=?"
+        args.append(as_of_event)
+    row = conn.execute(q + " ORDER BY last_event_id DESC LIMIT 1", args).fetchone()
+    if row:
+        instrument.count("bytes_deserialized", len(row[1]))
+    return (row[0], codec.decode_record(row[1])) if row else (0, storage.empty())
+
+
+def event_at(conn, uid, when):
+    # last event id recorded at or before the ISO timestamp `when`
+    row = conn.execute("SELECT MAX(id) FROM events WHERE participant_id=? AND created_at<=?",
+                       (uid, when)).fetchone()
+    return row[0] or 0
+
+
+def load(conn, uid, as_of_event=None):
+    # latest snapshot plus the events recorded after it; with as_of_event, the record as it was then
+    last, d = _snapshot(conn, uid, as_of_event)
+    q = "SELECT id, payload FROM events WHERE participant_id=? AND id>?"
+    args = [uid, last]
+    if as_of_event is not None:
+        q += " AND id<=?"
+        args.append(as_of_event)
+    for _, payload in conn.execute(q + " ORDER BY id", args):
+        instrument.count("bytes_deserialized", len(payload))
+        storage.apply(d, **codec.decode_event(payload))
+    return d
+
+
+def load_versioned(conn, uid):
+    # version first: a commit between the two reads then leaves newer data under an older
+    # version, which the next revalidation replaces, never older data under the newer one
+    v = storage.version(conn, uid)
+    return load(conn, uid), v
+
+
+def history(conn, uid):
+    cur = conn.execute("SELECT id, created_at, payload FROM events WHERE participant_id=? ORDER BY id", (uid,))
+    return [{"id": i, "created_at": t, **codec.decode_event(p)} for i, t, p in cur]
+
+
+def compact(conn, uid):
+    with conn:
+        last = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events WHERE participant_id=?", (uid,)).fetchone()[0]
+        blob = codec.encode_record(load(conn, uid))
+        instrument.count("bytes_serialized", len(blob))
+        conn.execute("INSERT INTO snapshots (participant_id, last_event_id, data, created_at) VALUES (?, ?, ?, ?) "
+                     "ON CONFLICT (participant_id, last_event_id) DO UPDATE SET data=excluded.data, "
+                     "created_at=excluded.created_at",
+                     (uid, last, blob, datetime.now().isoformat(timespec="seconds")))
+        conn.execute("UPDATE participants SET pending_events=0 WHERE id=?", (uid,))
+        # keep the oldest snapshot (the replay baseline for time travel) and the newest few
+        conn.execute(
+            "DELETE FROM snapshots WHERE participant_id=? AND last_event_id NOT IN ("
+            "SELECT MIN(last_event_id) FROM snapshots WHERE participant_id=?) AND last_event_id NOT IN ("
+            "SELECT last_event_id FROM snapshots WHERE participant_id=? ORDER BY last_event_id DESC LIMIT ?)",
+            (uid, uid, uid, KEEP_SNAPSHOTS))
+    return last
+
+
+def due(conn, threshold=COMPACT_EVERY, limit=100):
+    return [r[0] for r in conn.execute(
+        "SELECT id FROM participants WHERE pending_events>=? LIMIT ?", (threshold, limit))]
+
+
+class Compactor:
+    # background thread that folds long event tails into fresh snapshots so load() stays bounded
+
+    def __init__(self, threshold=COMPACT_EVERY, interval=COMPACT_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def run_once(self):
+        repo = repository.get()
+        uids = due(repo.reader(), self.threshold)
+        for uid in uids:
+            repo.write(compact, uid)
+        return len(uids)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                pass
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="smu-compactor", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
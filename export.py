@@ -0,0 +1,137 @@
+import argparse
+import csv
+import json
+import sys
+import time
+import storage
+import db
+import repository
+
+CHUNK_ROWS = 5000
+FORMATS = ["csv", "jsonl", "parquet"]
+
+COLUMNS = (["participant_id", "progress"]
+           + ["log_" + f for f in storage.LOG_FIELDS]
+           + ["pre_" + f for f in storage.PRETEST_FIELDS]
+           + ["post_" + f for f in storage.POSTTEST_FIELDS]
+           + ["day3_" + f for f in storage.DAY3_FIELDS])
+INT_COLUMNS = {"progress", "log_duration", "pre_daily_sm_min", "pre_distractions", "pre_sleep",
+               "pre_life_satisfaction", "pre_spare_time", "pre_goal_time", "post_daily_sm_min",
+               "post_distractions", "post_sleep", "post_life_satisfaction"}
+
+QUERY = ("SELECT p.id, p.progress, "
+         + ", ".join("l." + storage._q(f) for f in storage.LOG_FIELDS) + ", "
+         + ", ".join("pre." + storage._q(f) for f in storage.PRETEST_FIELDS) + ", "
+         + ", ".join("post." + storage._q(f) for f in storage.POSTTEST_FIELDS) + ", "
+         + ", ".join("d3." + storage._q(f) for f in storage.DAY3_FIELDS) + " "
+         "FROM participants p "
+         "LEFT JOIN logs l ON l.participant_id = p.id "
+         "LEFT JOIN pretest pre ON pre.participant_id = p.id "
+         "LEFT JOIN posttest post ON post.participant_id = p.id "
+         "LEFT JOIN day3 d3 ON d3.participant_id = p.id "
+         "ORDER BY p.id, l.date, l.id")
+
+
+def iter_chunks(conn, chunk_rows=CHUNK_ROWS):
+    # one row per log entry (participants without logs get one row with empty log columns)
+    cur = storage.stream(conn, QUERY)
+    try:
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+
+
+def _section(row, prefix, fields):
+    out = {f: row[prefix + f] for f in fields}
+    return out if any(v is not None for v in out.values()) else {}
+
+
+def iter_records(conn, chunk_rows=CHUNK_ROWS):
+    # rows arrive ordered by participant, so only one record is held in memory at a time
+    current = None
+    for rows in iter_chunks(conn, chunk_rows):
+        for r in rows:
+            row = dict(zip(COLUMNS, r))
+            if current is None or current["participant_id"] != row["participant_id"]:
+                if current is not None:
+                    yield current
+                current = {"participant_id": row["participant_id"], "progress": row["progress"], "logs": [],
+                           "pretest": _section(row, "pre_", storage.PRETEST_FIELDS),
+                           "day3": _section(row, "day3_", storage.DAY3_FIELDS)}
+                post = _section(row, "post_", storage.POSTTEST_FIELDS)
+                if post:
+                    current["day3"]["posttest"] = post
+            if row["log_date"] is not None:
+                current["logs"].append(storage._log_row([row["log_" + f] for f in storage.LOG_FIELDS]))
+    if current is not None:
+        yield current
+
+
+def write_csv(conn, out):
+    w = csv.writer(out)
+    w.writerow(COLUMNS)
+    n = 0
+    for rows in iter_chunks(conn):
+        w.writerows(rows)
+        n += len(rows)
+    return n
+
+
+def write_jsonl(conn, out):
+    n = 0
+    for rec in iter_records(conn):
+        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        n += 1
+    return n
+
+
+def write_parquet(conn, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet export needs pyarrow: pip install pyarrow")
+    schema = pa.schema([(c, pa.int64() if c in INT_COLUMNS else pa.string()) for c in COLUMNS])
+    n = 0
+    with pq.ParquetWriter(path, schema) as w:
+        for rows in iter_chunks(conn):
+            cols = list(zip(*rows))
+            w.write_table(pa.table([pa.array(cols[i], type=schema.field(i).type) for i in range(len(COLUMNS))],
+                                   schema=schema))
+            n += len(rows)
+    return n
+
+
+def export(fmt, path, db_path=None):
+    if db_path:
+        db.ensure_schema(db_path)
+        conn = db.connect(db_path)
+    else:
+        conn = repository.get().connect()
+    try:
+        if fmt == "parquet":
+            return write_parquet(conn, path)
+        if path == "-":
+            return (write_csv if fmt == "csv" else write_jsonl)(conn, sys.stdout)
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            return (write_csv if fmt == "csv" else write_jsonl)(conn, out)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export every participant's data (nightly job friendly).")
+    ap.add_argument("--format", choices=FORMATS, default="csv")
+    ap.add_argument("--out", default="-", help="output file, '-' for stdout (csv/jsonl only)")
+    ap.add_argument("--db", default=None, help="SQLite file (default: $SMU_DATABASE_URL, $SMU_DB or smu.db)")
+    args = ap.parse_args()
+    if args.format == "parquet" and args.out == "-":
+        ap.error("parquet export needs --out")
+    t0 = time.perf_counter()
+    n = export(args.format, args.out, args.db)
+    print("exported %d %s in %.1fs" % (n, "participants" if args.format == "jsonl" else "rows",
+                                        time.perf_counter() - t0), file=sys.stderr)
@@ -0,0 +1,247 @@
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+import storage
+import repository
+
+CHUNK_CHARS = 1 << 16
+FORMATS = ["csv", "json", "jsonl"]
+SOURCE = "screen-time import"
+
+# lowercased app names, package ids and bundle ids -> platform names used in the Day 1 tracker
+PLATFORMS = {
+    "Instagram": ["instagram", "com.instagram.android", "com.burbn.instagram"],
+    "TikTok": ["tiktok", "tik tok", "musical.ly", "com.zhiliaoapp.musically", "com.ss.android.ugc.trill"],
+    "Snapchat": ["snapchat", "com.snapchat.android", "com.toyopagroup.picaboo"],
+    "X": ["x", "twitter", "x (twitter)", "com.twitter.android", "com.atebits.tweetie2"],
+    "YouTube": ["youtube", "com.google.android.youtube", "com.google.ios.youtube"],
+    "Reddit": ["reddit", "com.reddit.frontpage"],
+    "LinkedIn": ["linkedin", "com.linkedin.android", "com.linkedin.linkedin"],
+}
+ALIASES = {alias: platform for platform, names in PLATFORMS.items() for alias in names}
+
+APP_KEYS = ["app", "app_name", "application", "package", "package_name", "bundle_id", "name"]
+DATE_KEYS = ["date", "day", "start", "start_time", "timestamp", "hour", "time"]
+# duration column -> seconds per unit; a bare "duration" uses the caller's unit
+DURATION_KEYS = {"seconds": 1, "duration_seconds": 1, "usage_seconds": 1, "total_seconds": 1,
+                 "minutes": 60, "duration_minutes": 60, "usage_minutes": 60,
+                 "duration_ms": 0.001, "milliseconds": 0.001, "total_time_ms": 0.001,
+                 "totaltimeinforeground": 0.001, "duration": None, "usage": None}
+UNITS = {"s": 1, "ms": 0.001, "min": 60}
+DATE_FORMATS = ["%m/%d/%Y", "%d.%m.%Y", "%Y/%m/%d"]
+
+
+def platform_for(app):
+    return _platform(str(app or "").strip().lower())
+
+
+@lru_cache(maxsize=4096)
+def _platform(name):
+    if name in ALIASES:
+        return ALIASES[name]
+    for alias, platform in ALIASES.items():
+        if "." in alias and name.startswith(alias):
+            return platform
+    return None
+
+
+def parse_date(value):
+    if isinstance(value, (int, float)):
+        # epoch seconds, or milliseconds from Android exports
+        return datetime.fromtimestamp(value / 1000 if value > 1e11 else value).date().isoformat()
+    s = str(value or "").strip()
+    if len(s) >= 10 and s[4] == "-" and s[7] == "-":
+        return s[:10]
+    if s.isdigit():
+        return parse_date(int(s))
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s[:10], fmt).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+def parse_seconds(value, scale):
+    if isinstance(value, str) and ":" in value:
+        parts = [float(p) for p in value.split(":")]
+        return sum(p * 60 ** i for i, p in enumerate(reversed(parts)))
+    return float(value) * scale
+
+
+# ── READERS ───────────────────────────────────────────
+
+def iter_csv(f):
+    yield from csv.DictReader(f)
+
+
+def iter_jsonl(f):
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_array(f, chunk_chars=CHUNK_CHARS):
+    # streams the objects of a top-level JSON array without holding the whole document
+    decoder = json.JSONDecoder()
+    buf, pos = f.read(chunk_chars), 0
+    started = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            more = f.read(chunk_chars)
+            if not more:
+                raise ValueError("unexpected end of JSON array")
+            buf, pos = buf[pos:] + more, 0
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("expected a JSON array of records")
+            started, pos = True, pos + 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            more = f.read(chunk_chars)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield obj
+        pos = end
+        if pos > chunk_chars:
+            buf, pos = buf[pos:], 0
+
+
+READERS = {"csv": iter_csv, "json": iter_json_array, "jsonl": iter_jsonl}
+
+
+def _columns(row, unit):
+    keys = {k.strip().lower(): k for k in row}
+    app = next((keys[k] for k in APP_KEYS if k in keys), None)
+    when = next((keys[k] for k in DATE_KEYS if k in keys), None)
+    duration = next(((keys[k], UNITS[unit] if s is None else s) for k, s in DURATION_KEYS.items() if k in keys), None)
+    if app is None or when is None or duration is None:
+        raise ValueError("can't find app, date and duration columns in " + ", ".join(row))
+    return app, when, duration
+
+
+def aggregate(rows, unit="s", stats=None):
+    # (date, platform) -> seconds; memory grows with days x platforms, not with the file
+    stats = stats if stats is not None else {}
+    stats.update(rows=0, matched=0, skipped=0)
+    totals = {}
+    columns = None
+    for row in rows:
+        stats["rows"] += 1
+        if columns is None:
+            columns = _columns(row, unit)
+        app, when, (duration, scale) = columns
+        platform = platform_for(row.get(app))
+        day = parse_date(row.get(when))
+        if platform is None or day is None:
+            stats["skipped"] += 1
+            continue
+        try:
+            seconds = parse_seconds(row.get(duration), scale)
+        except (TypeError, ValueError):
+            stats["skipped"] += 1
+            continue
+        stats["matched"] += 1
+        totals[(day, platform)] = totals.get((day, platform), 0.0) + seconds
+    return totals
+
+
+# ── STORE ─────────────────────────────────────────────
+
+def daily_logs(totals):
+    days = {}
+    for (day, platform), seconds in totals.items():
+        days.setdefault(day, {})[platform] = seconds / 60
+    logs = []
+    for day in sorted(days):
+        minutes = days[day]
+        logs.append({"date": day, "duration": round(sum(minutes.values())),
+                     "apps": sorted(minutes, key=minutes.get, reverse=True)})
+    return logs
+
+
+def _store(conn, uid, totals, source):
+    # one transaction: a log for every day not logged yet, and the per-platform breakdown
+    # of every imported day (re-importing a file overwrites its rows)
+    # returns the new logs, the version and the changed platform totals as
+    # ({"date platform": old minutes}, {"date platform": new minutes})
+    now = storage._now()
+    with conn:
+        seen = storage.logged_dates(conn, uid)
+        logs = [log for log in daily_logs(totals) if log["date"] not in seen]
+        old = {"%s %s" % (day, platform): minutes for day, platform, minutes in conn.execute(
+            "SELECT date, platform, minutes FROM usage_by_platform WHERE participant_id=?", (uid,))}
+        new = {}
+        for (day, platform), seconds in totals.items():
+            key = "%s %s" % (day, platform)
+            if old.get(key) != seconds / 60:
+                new[key] = seconds / 60
+        if not logs and not new:
+            # nothing new: don't create the participant or bump their version
+            return logs, storage.version(conn, uid), ({}, {})
+        storage.add_logs(conn, uid, 0, logs)
+        conn.executemany(
+            "INSERT INTO usage_by_platform (participant_id, date, platform, minutes, source, imported_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (participant_id, date, platform) DO UPDATE SET "
+            "minutes=excluded.minutes, source=excluded.source, imported_at=excluded.imported_at",
+            [(uid, day, platform, seconds / 60, source, now) for (day, platform), seconds in totals.items()])
+        return logs, storage.version(conn, uid), ({k: old.get(k) for k in new}, new)
+
+
+def ingest(uid, f, fmt="csv", unit="s", source=SOURCE, repo=None):
+    # f: a text stream; returns counts and throughput
+    repo = repo or repository.get()
+    stats = {}
+    t0 = time.perf_counter()
+    totals = aggregate(READERS[fmt](f), unit, stats)
+    stats["days"] = len({day for day, _ in totals})
+    logs, version, (old, new) = repo.write(_store, uid, totals, source)
+    if logs or new:
+        repo.audit().record(uid, version, "import:" + source, {"progress": 0, "usage": old}, logs=logs, usage=new)
+    stats["logs_added"] = len(logs)
+    stats["days_skipped"] = stats["days"] - stats["logs_added"]
+    repo.announce(uid)
+    stats["seconds"] = time.perf_counter() - t0
+    stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def detect_format(name):
+    ext = os.path.splitext(name)[1].lower().lstrip(".")
+    return {"ndjson": "jsonl"}.get(ext, ext) if ext in FORMATS + ["ndjson"] else "csv"
+
+
+def ingest_upload(uid, upload, unit="s"):
+    # Streamlit UploadedFile (binary) -> ingest(); the file is read in chunks, not decoded at once
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    try:
+        return ingest(uid, text, detect_format(upload.name), unit)
+    finally:
+        text.detach()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Import a screen-time export into a participant's logs.")
+    ap.add_argument("participant")
+    ap.add_argument("file")
+    ap.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension")
+    ap.add_argument("--unit", choices=sorted(UNITS), default="s", help="unit of a bare 'duration' column")
+    args = ap.parse_args()
+    with open(args.file, encoding="utf-8-sig", newline="") as fh:
+        s = ingest(args.participant, fh, args.format or detect_format(args.file), args.unit)
+    print("%d rows (%d matched, %d skipped), %d days: %d logs added, %d already logged; %.0f rows/s" % (
+        s["rows"], s["matched"], s["skipped"], s["days"], s["logs_added"], s["days_skipped"], s["rows_per_sec"]))
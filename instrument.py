@@ -0,0 +1,239 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+HISTORY = 1000
+SAMPLE_INTERVAL = 0.005
+JSONL_PATH = os.environ.get("SMU_METRICS_JSONL")
+PROMETHEUS_PORT = os.environ.get("SMU_METRICS_PORT")
+PROFILE_DIR = os.environ.get("SMU_PROFILE_DIR", "profiles")
+
+_local = threading.local()
+_lock = threading.Lock()
+spans = {}        # span name -> deque of recent durations (seconds)
+counters = {}     # counter name -> running total
+reruns = deque(maxlen=HISTORY)
+_open = set()     # Rerun handles not finished yet, from any thread
+_profile_next = None
+profiles = []
+
+
+def _observe(name, seconds):
+    with _lock:
+        if name not in spans:
+            spans[name] = deque(maxlen=HISTORY)
+        spans[name].append(seconds)
+
+
+def count(name, n=1):
+    with _lock:
+        counters[name] = counters.get(name, 0) + n
+    current = getattr(_local, "rerun", None)
+    if current is not None:
+        current["counters"][name] = current["counters"].get(name, 0) + n
+
+
+@contextmanager
+def span(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        _observe(name, dt)
+        current = getattr(_local, "rerun", None)
+        if current is not None:
+            current["spans"][name] = current["spans"].get(name, 0.0) + dt * 1000
+
+
+# ── RERUNS ────────────────────────────────────────────
+
+class Rerun:
+    def __init__(self, page):
+        global _profile_next
+        finish_current()
+        self.record = {"page": page, "at": time.strftime("%Y-%m-%dT%H:%M:%S"), "spans": {}, "counters": {}}
+        self.t0 = time.perf_counter()
+        self.thread = threading.current_thread()
+        self.profiler = None
+        with _lock:
+            kind, _profile_next = _profile_next, None
+            _open.add(self)
+        if kind == "cprofile":
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif kind == "sample":
+            self.profiler = Sampler(threading.get_ident()).start()
+        _local.rerun = self.record
+        _local.handle = self
+
+    def finish(self, interrupted=False):
+        with _lock:
+            if self not in _open:
+                return
+            _open.discard(self)
+        if getattr(_local, "handle", None) is self:
+            _local.rerun = _local.handle = None
+        if interrupted:
+            self.record["interrupted"] = True
+        dt = time.perf_counter() - self.t0
+        self.record["total_ms"] = dt * 1000
+        _observe("rerun." + self.record["page"], dt)
+        if self.profiler is not None:
+            self.record["profile"] = _dump_profile(self.profiler, self.record["page"])
+        with _lock:
+            reruns.append(self.record)
+        if JSONL_PATH:
+            with open(JSONL_PATH, "a") as f:
+                f.write(json.dumps(self.record) + "\n")
+
+
+def rerun(page):
+    return Rerun(page)
+
+
+def current():
+    return getattr(_local, "rerun", None)
+
+
+@contextmanager
+def attached(record):
+    # lets a helper thread (e.g. the db writer) account its work to the caller's rerun
+    previous = getattr(_local, "rerun", None)
+    _local.rerun = record
+    try:
+        yield
+    finally:
+        _local.rerun = previous
+
+
+def finish_current():
+    # a script cut short by st.stop() or a rerun request never reaches its finish(). Streamlit
+    # starts the next rerun on a new thread, so close this thread's open rerun and any whose
+    # thread has ended (which also stops their sampler); their total_ms runs until now
+    handle = getattr(_local, "handle", None)
+    with _lock:
+        stale = [r for r in _open if r is handle or not r.thread.is_alive()]
+    for r in stale:
+        r.finish(interrupted=True)
+
+
+# ── PROFILING ─────────────────────────────────────────
+
+def profile_next_rerun(kind="sample"):
+    global _profile_next
+    with _lock:
+        _profile_next = kind
+
+
+class Sampler:
+    # wall-clock stack sampler for one thread; output is folded stacks for flamegraph.pl / speedscope
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="smu-sampler", daemon=True)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def _dump_profile(profiler, page):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, "%s-%s" % (page.replace("/", "_"), time.strftime("%Y%m%d-%H%M%S")))
+    if isinstance(profiler, Sampler):
+        profiler.stop()
+        path = base + ".folded"
+        with open(path, "w") as f:
+            for stack, n in sorted(profiler.stacks.items()):
+                f.write("%s %d\n" % (stack, n))
+    else:
+        profiler.disable()
+        path = base + ".prof"
+        profiler.dump_stats(path)
+    profiles.append(path)
+    return path
+
+
+# ── EXPORT ────────────────────────────────────────────
+
+def quantile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * (len(values) - 1) + 0.5))]
+
+
+def snapshot():
+    with _lock:
+        return {name: list(v) for name, v in spans.items()}, dict(counters), list(reruns)
+
+
+def prometheus_text():
+    span_data, counter_data, _ = snapshot()
+    lines = ["# TYPE smu_span_seconds summary"]
+    for name, values in sorted(span_data.items()):
+        for q in (0.5, 0.95, 0.99):
+            lines.append('smu_span_seconds{span="%s",quantile="%s"} %.6f' % (name, q, quantile(values, q)))
+        lines.append('smu_span_seconds_sum{span="%s"} %.6f' % (name, sum(values)))
+        lines.append('smu_span_seconds_count{span="%s"} %d' % (name, len(values)))
+    lines.append("# TYPE smu_counter_total counter")
+    for name, value in sorted(counter_data.items()):
+        lines.append('smu_counter_total{counter="%s"} %d' % (name, value))
+    return "\n".join(lines) + "\n"
+
+
+_server = None
+
+
+def serve_prometheus(port=None):
+    # idempotent; binds to localhost only
+    global _server
+    port = int(port or PROMETHEUS_PORT or 0)
+    if _server is None and port:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+        except OSError:
+            return None
+        threading.Thread(target=_server.serve_forever, name="smu-metrics", daemon=True).start()
+    return _server
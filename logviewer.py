@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import re
+import threading
+import storage
+import repository
+from cache import LRU
+
+PAGE_SIZE = 25
+CHUNK_ROWS = 5000
+TRIGGER_OPTIONS_MAX = 200
+PLATFORMS = ["Instagram", "TikTok", "Snapchat", "X", "YouTube", "Reddit", "LinkedIn"]
+LOG_COLS = ", ".join("l." + storage._q(f) for f in storage.LOG_FIELDS)
+
+_triggers = LRU(256)
+_lock = threading.Lock()
+
+
+def search_terms(text):
+    return re.findall(r"\w+", text or "")
+
+
+def _where(conn, uid, filters):
+    # filters: start/end (ISO dates), platform, trigger, text; every query is scoped by
+    # logs_participant_date, so its cost follows the page size, not the participant's history
+    where, params = ["l.participant_id=?"], [uid]
+    if filters.get("start"):
+        where.append("l.date>=?")
+        params.append(filters["start"])
+    if filters.get("end"):
+        where.append("l.date<=?")
+        params.append(filters["end"])
+    if filters.get("platform"):
+        # apps holds a JSON array
+        where.append("l.apps LIKE ?")
+        params.append("%" + json.dumps(filters["platform"], ensure_ascii=False) + "%")
+    if filters.get("trigger"):
+        where.append('l."trigger"=?')
+        params.append(filters["trigger"])
+    terms = search_terms(filters.get("text"))
+    if terms:
+        if isinstance(conn, repository.PgConnection):
+            where.append(storage.search_vector("l.") + " @@ to_tsquery('simple', ?)")
+            params.append(" & ".join(t + ":*" for t in terms))
+        elif storage.has_fts(conn):
+            # a subquery, not a join: the match set is built once instead of matched per log
+            where.append("l.id IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?)")
+            params.append(" ".join('"' + t + '"*' for t in terms))
+        else:
+            for t in terms:
+                where.append("(" + " OR ".join("l." + storage._q(f) + " LIKE ?" for f in storage.SEARCH_FIELDS) + ")")
+                params += ["%" + t + "%"] * len(storage.SEARCH_FIELDS)
+    return where, params
+
+
+def _query(conn, uid, filters, after=None, limit=None):
+    where, params = _where(conn, uid, filters or {})
+    if after:
+        where.append("(l.date, l.id) < (?, ?)")
+        params += list(after)
+    sql = ("SELECT l.id, " + LOG_COLS + " FROM logs l WHERE " + " AND ".join(where)
+           + " ORDER BY l.date DESC, l.id DESC")
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params)
+
+
+def page(conn, uid, filters=None, after=None, limit=PAGE_SIZE):
+    # newest first; after is the (date, id) key of the previous page's last row,
+    # and the returned key is None on the last page
+    rows = _query(conn, uid, filters, after, limit + 1).fetchall()
+    logs = [dict(storage._log_row(r[1:]), id=r[0]) for r in rows[:limit]]
+    return logs, (logs[-1]["date"], logs[-1]["id"]) if len(rows) > limit else None
+
+
+def triggers(conn, uid, version):
+    # filter options; re-read only when the participant's record changes
+    with _lock:
+        values = _triggers.get((uid, version))
+    if values is None:
+        values = [r[0] for r in conn.execute(
+            'SELECT DISTINCT "trigger" FROM logs WHERE participant_id=? AND "trigger"<>\'\' ORDER BY 1 LIMIT ?',
+            (uid, TRIGGER_OPTIONS_MAX))]
+        with _lock:
+            _triggers.put((uid, version), values)
+    return values
+
+
+def csv_text(conn, uid, filters=None):
+    # every matching row, for the download button; only built when it is clicked
+    out = io.StringIO()
+    w = csv.writer(out)
+    w.writerow(storage.LOG_FIELDS)
+    cur = _query(conn, uid, filters)
+    while True:
+        rows = cur.fetchmany(CHUNK_ROWS)
+        if not rows:
+            return out.getvalue()
+        for r in rows:
+            log = storage._log_row(r[1:])
+            w.writerow([", ".join(v) if isinstance(v, list) else v for v in log.values()])
@@ -0,0 +1,262 @@
+import threading
+import time
+import argparse
+import os
+from datetime import datetime
+import repository
+
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30.0
+BACKOFF_MAX = 3600.0
+LEASE_SECONDS = 300.0
+POLL_SECONDS = 2.0
+IDLE_CLOSE_SECONDS = 60.0
+
+
+def render_report(user_id, data):
+    import pandas as pd
+    logs_df = pd.DataFrame(data["logs"]) if data["logs"] else pd.DataFrame()
+    body = "SMU Training Report\n====================\n"
+    body += "Participant: " + user_id + "\n"
+    body += "Days Completed: " + str(data["progress"]) + "\n\n"
+    if data.get("pretest"):
+        body += "PRE-TEST ANSWERS:\n"
+        for k, v in data["pretest"].items():
+            body += k + ": " + str(v) + "\n"
+        body += "\n"
+    body += "USAGE LOGS:\n"
+    body += logs_df.to_string() if not logs_df.empty else "No logs"
+    if data.get("day3"):
+        body += "\n\nDAY 3 PERSONAL RULES:\n" + str(data["day3"].get("rules", ""))
+        body += "\nWARNING SIGNS: " + str(data["day3"].get("warning_signs", ""))
+        body += "\nRECOVERY PLAN: " + str(data["day3"].get("recovery_plan", ""))
+    return body
+
+
+# ── QUEUE ─────────────────────────────────────────────
+
+def _insert(conn, participant_id, recipient, subject, body, now=None):
+    # no transaction of its own, so callers can queue a message atomically with their own rows
+    now = time.time() if now is None else now
+    return conn.execute(
+        "INSERT INTO outbox (participant_id, recipient, subject, body, next_attempt_at, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) RETURNING id",
+        (participant_id, recipient, subject, body, now,
+         datetime.fromtimestamp(now).isoformat(timespec="seconds"))).fetchone()[0]
+
+
+def _enqueue(conn, participant_id, recipient, subject, body):
+    with conn:
+        return _insert(conn, participant_id, recipient, subject, body)
+
+
+def enqueue(participant_id, recipient, subject, body):
+    return repository.get().write(_enqueue, participant_id, recipient, subject, body)
+
+
+def enqueue_report(user_id, data, receiver):
+    return enqueue(user_id, receiver, "SMU Report - " + user_id, render_report(user_id, data))
+
+
+def status(message_id):
+    row = repository.get().reader().execute(
+        "SELECT status, attempts, last_error, sent_at FROM outbox WHERE id=?", (message_id,)).fetchone()
+    if not row:
+        return None
+    return dict(zip(["status", "attempts", "last_error", "sent_at"], row))
+
+
+def _claim(conn, limit, now):
+    # an expired claim means its worker died mid-send: that counts as a failed attempt, so a
+    # message that keeps killing workers ends up failed instead of being reclaimed forever
+    with conn:
+        rows = conn.execute(
+            "UPDATE outbox SET "
+            "status=CASE WHEN status='sending' AND attempts+1>=? THEN 'failed' ELSE 'sending' END, "
+            "attempts=attempts+CASE WHEN status='sending' THEN 1 ELSE 0 END, "
+            "last_error=CASE WHEN status='sending' THEN 'claim expired' ELSE last_error END, "
+            "claimed_at=? WHERE id IN ("
+            "SELECT id FROM outbox WHERE (status='queued' AND next_attempt_at<=?) "
+            "OR (status='sending' AND claimed_at<?) ORDER BY id LIMIT ?) "
+            "RETURNING id, recipient, subject, body, attempts, status",
+            (MAX_ATTEMPTS, now, now, now - LEASE_SECONDS, limit)).fetchall()
+    return [r[:5] for r in rows if r[5] == "sending"]
+
+
+def _renew(conn, message_id, claimed_at, now):
+    # extend our lease right before sending; False if another worker has taken it over
+    with conn:
+        return conn.execute("UPDATE outbox SET claimed_at=? WHERE id=? AND status='sending' AND claimed_at=? "
+                            "RETURNING id", (now, message_id, claimed_at)).fetchone() is not None
+
+
+def _mark_sent(conn, message_id):
+    with conn:
+        conn.execute("UPDATE outbox SET status='sent', sent_at=?, last_error=NULL WHERE id=?",
+                     (datetime.now().isoformat(timespec="seconds"), message_id))
+
+
+def _mark_failed(conn, message_id, attempts, error, now):
+    attempts += 1
+    state = "failed" if attempts >= MAX_ATTEMPTS else "queued"
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    with conn:
+        conn.execute("UPDATE outbox SET status=?, attempts=?, last_error=?, next_attempt_at=?, claimed_at=NULL "
+                     "WHERE id=?", (state, attempts, error, now + delay, message_id))
+
+
+# ── SMTP ──────────────────────────────────────────────
+
+class SMTPSender:
+    # keeps one authenticated connection open and reconnects when the server drops it
+
+    def __init__(self, host="smtp.gmail.com", port=465, user=None, password=None, sender=None, ssl=True,
+                 timeout=30):
+        self.host, self.port, self.ssl, self.timeout = host, port, ssl, timeout
+        self.user, self.password = user, password
+        self.sender = sender or user or "smu-training@localhost"
+        self.server = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        import smtplib
+        cls = smtplib.SMTP_SSL if self.ssl else smtplib.SMTP
+        server = cls(self.host, self.port, timeout=self.timeout)
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    def send(self, recipient, subject, body):
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+        msg = MIMEMultipart()
+        msg["From"] = self.sender
+        msg["To"] = recipient
+        msg["Subject"] = subject
+        msg.attach(MIMEText(body, "html" if body.startswith("<!DOCTYPE html>") else "plain"))
+        if self.server is None:
+            self.server = self._connect()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.server = self._connect()
+            self.server.send_message(msg)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        import smtplib
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPException:
+                pass
+            self.server = None
+
+
+def config_from_secrets(secrets):
+    return {
+        "host": secrets.get("SMTP_HOST", "smtp.gmail.com"),
+        "port": int(secrets.get("SMTP_PORT", 465)),
+        "ssl": str(secrets.get("SMTP_SSL", "true")).lower() == "true",
+        "user": secrets.get("EMAIL_ADDRESS"),
+        "password": secrets.get("EMAIL_PASSWORD"),
+    }
+
+
+# ── WORKER ────────────────────────────────────────────
+
+class OutboxWorker:
+    def __init__(self, sender, batch_size=BATCH_SIZE, poll=POLL_SECONDS, clock=time.time, rate=None,
+                 sleep=time.sleep, repo=None):
+        # rate: at most that many messages per second (providers throttle bulk senders)
+        self.sender = sender
+        self.repo = repo
+        self.batch_size = batch_size
+        self.poll = poll
+        self.clock = clock
+        self.rate = rate
+        self.sleep = sleep
+        self.next_send = 0.0
+        self.stop_event = threading.Event()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def drain_once(self):
+        import smtplib
+        now = self.clock()
+        repo = self.repo or repository.get()
+        batch = repo.write(_claim, self.batch_size, now)
+        for message_id, recipient, subject, body, attempts in batch:
+            self._pace()
+            # the lease covers one send, not the whole batch (batch_size * SMTP timeout)
+            if not repo.write(_renew, message_id, now, self.clock()):
+                continue
+            try:
+                self.sender.send(recipient, subject, body)
+            except (smtplib.SMTPException, OSError) as e:
+                self.sender.close()
+                repo.write(_mark_failed, message_id, attempts, str(e), now)
+            else:
+                repo.write(_mark_sent, message_id)
+        return len(batch)
+
+    def _pace(self):
+        if not self.rate:
+            return
+        now = self.clock()
+        if self.next_send > now:
+            self.sleep(self.next_send - now)
+        self.next_send = max(now, self.next_send) + 1.0 / self.rate
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                n = self.drain_once()
+            except Exception:
+                n = 0
+            if n == 0:
+                if self.sender.server is not None and time.monotonic() - self.sender.last_used > IDLE_CLOSE_SECONDS:
+                    self.sender.close()
+                self.wake.wait(self.poll)
+                self.wake.clear()
+        self.sender.close()
+
+    def notify(self):
+        self.wake.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="smu-outbox", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread:
+            self.thread.join()
+
+
+if __name__ == "__main__":
+    # standalone worker, e.g. against a local stub: python -m aiosmtpd -n -l localhost:8025
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default=os.environ.get("SMTP_HOST", "smtp.gmail.com"))
+    ap.add_argument("--port", type=int, default=int(os.environ.get("SMTP_PORT", 465)))
+    ap.add_argument("--no-ssl", action="store_true")
+    ap.add_argument("--once", action="store_true", help="drain due messages and exit")
+    ap.add_argument("--rate", type=float, default=None, help="max messages per second")
+    args = ap.parse_args()
+    smtp = SMTPSender(args.host, args.port, os.environ.get("EMAIL_ADDRESS"), os.environ.get("EMAIL_PASSWORD"),
+                      ssl=not args.no_ssl)
+    worker = OutboxWorker(smtp, rate=args.rate)
+    if args.once:
+        while worker.drain_once():
+            pass
+        smtp.close()
+    else:
+        worker.start()
+        try:
+            worker.thread.join()
+        except KeyboardInterrupt:
+            worker.stop()
@@ -1,7 +1,10 @@
 import streamlit as st
-import sqlite3
+import repository
+import instrument
 import json
 
+rerun = instrument.rerun("day2")
+
 st.header("Day 2: Intervention Strategies")
 
 st.markdown("""
@@ -17,9 +20,13 @@ task1 = checkboxes[0].checkbox("App limits set")
 task2 = checkboxes[1].checkbox("Notifications off")
 task3 = checkboxes[2].checkbox("Screen-free zone")
 
-if st.button("Complete Day 2") and sum([task1,task2,task3]) >=2:
-    conn = sqlite3.connect('data.db')
-    c = conn.cursor()
-    c.execute("UPDATE users SET progress=2 WHERE id=?", (user_id,))
-    conn.commit()
-    st.success("Day 2 Complete!")
+if user_id and st.button("Complete Day 2") and sum([task1,task2,task3]) >=2:
+    repo = repository.get()
+    if repo.summary(user_id)["progress"] < 1:
+        st.error("Save Day 1 with this ID first.")
+    else:
+        with instrument.span("save"):
+            repo.submit(user_id, 2)
+        st.success("Day 2 Complete!")
+
+rerun.finish()
@@ -1,5 +1,8 @@
 import streamlit as st
-import sqlite3
+import repository
+import instrument
+
+rerun = instrument.rerun("day3")
 
 st.header("Day 3: Sustainability Plan")
 
@@ -12,10 +15,14 @@ st.markdown("""
 
 user_id = st.text_input("ID")
 rules = st.text_area("My 3 Personal Rules")
-if st.button("Finalize Program"):
-    conn = sqlite3.connect('data.db')
-    c = conn.cursor()
-    c.execute("UPDATE users SET progress=3 WHERE id=?", (user_id,))
-    conn.commit()
-    st.balloons()
-    st.success("Program Complete!")
+if user_id and st.button("Finalize Program"):
+    repo = repository.get()
+    if repo.summary(user_id)["progress"] < 2:
+        st.error("Complete Day 2 with this ID first.")
+    else:
+        with instrument.span("save"):
+            repo.submit(user_id, 3)
+        st.balloons()
+        st.success("Program Complete!")
+
+rerun.finish()
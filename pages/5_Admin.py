@@ -0,0 +1,99 @@
+import streamlit as st
+import os
+import tempfile
+import export
+import instrument
+
+st.header("Facilitator Admin")
+
+password = st.text_input("Admin password", type="password")
+if not password:
+    st.stop()
+if password != st.secrets.get("ADMIN_PASSWORD"):
+    st.error("Wrong password.")
+    st.stop()
+
+st.subheader("Cohort Export")
+fmt = st.selectbox("Format", export.FORMATS)
+if st.button("Build export"):
+    path = os.path.join(tempfile.mkdtemp(), "smu_cohort." + fmt)
+    with st.spinner("Exporting..."):
+        n = export.export(fmt, path)
+    st.session_state["export_path"] = path
+    st.success(f"Exported {n} {'participants' if fmt == 'jsonl' else 'rows'}.")
+if st.session_state.get("export_path") and os.path.exists(st.session_state["export_path"]):
+    path = st.session_state["export_path"]
+    with open(path, "rb") as f:
+        st.download_button("Download " + os.path.basename(path), f, os.path.basename(path))
+
+st.subheader("Cohort Analytics")
+if st.button("Compute cohort results"):
+    import analytics
+    import repository
+    with st.spinner("Computing..."):
+        report = analytics.cohort_report(repository.get().reader())
+    st.metric("Participants", report["participants"])
+    st.markdown("**Pre vs post (paired t-test, Cohen's d on the paired differences)**")
+    st.dataframe(report["effects"], use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Platforms**")
+        st.dataframe(report["platforms"], use_container_width=True)
+    with col2:
+        st.markdown("**Reasons**")
+        st.dataframe(report["reasons"], use_container_width=True)
+    col1, col2 = st.columns(2)
+    col1.markdown("**Emotion before**")
+    col1.dataframe(report["emotions"]["before"], use_container_width=True)
+    col2.markdown("**Emotion after**")
+    col2.dataframe(report["emotions"]["after"], use_container_width=True)
+    st.markdown("**Cohort usage trend**")
+    st.line_chart(report["trend"].set_index("date")["mean"])
+
+st.subheader("Relapse Risk")
+if st.button("Show relapse-risk flags") or st.session_state.get("show_flags"):
+    import anomaly
+    import pandas as pd
+    import repository
+    st.session_state["show_flags"] = True
+    conn = repository.get().reader()
+    risk = anomaly.at_risk(conn)
+    if not risk:
+        st.caption(f"No flags in the last {anomaly.RECENT_DAYS} days.")
+    else:
+        st.dataframe(pd.DataFrame(risk, columns=["participant", "flags", "latest", "ewma_min", "streak", "last_log"]),
+                     use_container_width=True)
+        kind = st.selectbox("Flag type", ["all"] + anomaly.KINDS)
+        st.dataframe(pd.DataFrame(anomaly.flags(conn, kind=None if kind == "all" else kind)),
+                     use_container_width=True)
+
+st.subheader("Performance")
+span_data, counter_data, recent = instrument.snapshot()
+if not span_data:
+    st.info("No reruns recorded in this server process yet.")
+else:
+    import pandas as pd
+    st.dataframe(pd.DataFrame([
+        {"span": name, "count": len(v), "p50_ms": instrument.quantile(v, 0.5) * 1000,
+         "p95_ms": instrument.quantile(v, 0.95) * 1000, "p99_ms": instrument.quantile(v, 0.99) * 1000}
+        for name, v in sorted(span_data.items())]), use_container_width=True)
+    name = st.selectbox("Histogram", sorted(span_data))
+    ms = pd.Series(span_data[name]) * 1000
+    st.bar_chart(ms.value_counts(bins=min(20, max(1, len(ms)))).sort_index().rename(lambda b: round(b.right, 1)))
+    st.json(counter_data)
+    if recent:
+        st.markdown("**Last reruns**")
+        st.dataframe(pd.DataFrame([{"page": r["page"], "at": r["at"], "total_ms": r["total_ms"],
+                                    "db_queries": r["counters"].get("db_queries", 0),
+                                    "bytes_serialized": r["counters"].get("bytes_serialized", 0)}
+                                   for r in recent[-50:]]), use_container_width=True)
+col1, col2 = st.columns(2)
+if col1.button("Profile next rerun (stack sampler)"):
+    instrument.profile_next_rerun("sample")
+    st.success("The next page rerun in this process will be sampled.")
+if col2.button("Profile next rerun (cProfile)"):
+    instrument.profile_next_rerun("cprofile")
+    st.success("The next page rerun in this process will be profiled.")
+for path in reversed(instrument.profiles[-5:]):
+    with open(path, "rb") as f:
+        st.download_button("Download " + path, f.read(), path.split("/")[-1], key=path)
@@ -0,0 +1,243 @@
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import outbox
+import repository
+
+PROGRAM_DAYS = 14
+REMINDER_HOUR = 18
+DIGEST_HOUR = 8
+BEHIND_DAYS = 2
+DIGEST_LIST_MAX = 50
+BATCH_SIZE = 100
+INTERVAL_SECONDS = 300.0
+RATE = 2.0
+
+REMINDER_SUBJECT = "SMU Training - day %d of 14: log today's screen time"
+REMINDER_BODY = """Hi %s,
+
+You're on day %d of the 14-day SMU Training Program and haven't logged your social media use today.
+It only takes a minute: open the app, enter your Participant ID and add today's entry in the tracker.
+
+Last log: %s
+
+You get this because you entered this address in the app. Clear it in the sidebar to stop reminders.
+"""
+DIGEST_SUBJECT = "SMU Training - facilitator digest %s"
+
+
+def _day(now):
+    return datetime.fromtimestamp(now).date()
+
+
+def _program_start(today):
+    return (today - timedelta(days=PROGRAM_DAYS - 1)).isoformat()
+
+
+# ── DUE ───────────────────────────────────────────────
+# all scans start from participant_summary's (progress, last_log_date) index
+
+def due_reminders(conn, today, limit=BATCH_SIZE):
+    # started the program within the last 14 days, gave an address, nothing logged today and not reminded yet
+    d = today.isoformat()
+    return conn.execute(
+        "SELECT s.participant_id, s.first_log_date, s.last_log_date, c.email FROM participant_summary s "
+        "JOIN contacts c ON c.participant_id=s.participant_id "
+        "WHERE s.progress>=1 AND s.last_log_date<? AND s.first_log_date>=? "
+        "AND NOT EXISTS (SELECT 1 FROM notifications n WHERE n.kind='reminder' AND n.target=s.participant_id "
+        "AND n.due_date=?) "
+        "ORDER BY s.progress, s.last_log_date, s.participant_id LIMIT ?",
+        (d, _program_start(today), d, limit)).fetchall()
+
+
+def cohort(conn, today):
+    start = _program_start(today)
+    yesterday = (today - timedelta(days=1)).isoformat()
+    behind = (today - timedelta(days=BEHIND_DAYS)).isoformat()
+    return {
+        "sessions": dict(conn.execute("SELECT progress, COUNT(*) FROM participant_summary WHERE progress>=1 "
+                                      "GROUP BY progress ORDER BY progress").fetchall()),
+        "active": conn.execute("SELECT COUNT(*) FROM participant_summary WHERE progress>=1 AND first_log_date>=?",
+                               (start,)).fetchone()[0],
+        "logged_yesterday": conn.execute(
+            "SELECT COUNT(*) FROM participant_summary WHERE progress>=1 AND last_log_date>=? AND first_log_date>=?",
+            (yesterday, start)).fetchone()[0],
+        "behind": conn.execute(
+            "SELECT participant_id, progress, last_log_date FROM participant_summary "
+            "WHERE progress>=1 AND last_log_date<=? AND first_log_date>=? ORDER BY last_log_date LIMIT ?",
+            (behind, start, DIGEST_LIST_MAX)).fetchall(),
+    }
+
+
+# ── RENDER ────────────────────────────────────────────
+
+def render_reminder(uid, first_log_date, last_log_date, today):
+    day = (today - datetime.strptime(first_log_date, "%Y-%m-%d").date()).days + 1
+    return REMINDER_SUBJECT % day, REMINDER_BODY % (uid, day, last_log_date)
+
+
+def render_digest(c, today):
+    body = "SMU Training facilitator digest for " + today.isoformat() + "\n\n"
+    body += "Active participants (started in the last %d days): %d\n" % (PROGRAM_DAYS, c["active"])
+    body += "Logged since yesterday: %d\n" % c["logged_yesterday"]
+    body += "Sessions completed: " + (", ".join("Day %d: %d" % kv for kv in c["sessions"].items()) or "none") + "\n\n"
+    if c["behind"]:
+        body += "No log for %d+ days:\n" % BEHIND_DAYS
+        for uid, progress, last in c["behind"]:
+            body += "  %s (Day %d done, last log %s)\n" % (uid, progress, last)
+    else:
+        body += "Everyone active has logged in the last %d days.\n" % BEHIND_DAYS
+    return DIGEST_SUBJECT % today.isoformat(), body
+
+
+# ── QUEUE ─────────────────────────────────────────────
+
+def _queue(conn, kind, target, due, recipient, subject, body, now, participant_id=None):
+    # inside the caller's transaction: claim the (kind, target, day) slot, then queue the message.
+    # A restart or a second scheduler finds the slot taken and queues nothing.
+    row = conn.execute(
+        "INSERT INTO notifications (kind, target, due_date, created_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (kind, target, due_date) DO NOTHING RETURNING id",
+        (kind, target, due, datetime.fromtimestamp(now).isoformat(timespec="seconds"))).fetchone()
+    if not row:
+        return None
+    message_id = outbox._insert(conn, participant_id, recipient, subject, body, now)
+    conn.execute("UPDATE notifications SET outbox_id=? WHERE id=?", (message_id, row[0]))
+    return message_id
+
+
+def _plan_reminders(conn, today, now, limit):
+    with conn:
+        rows = due_reminders(conn, today, limit)
+        for uid, first, last, email in rows:
+            subject, body = render_reminder(uid, first, last, today)
+            _queue(conn, "reminder", uid, today.isoformat(), email, subject, body, now, uid)
+    return len(rows)
+
+
+def _plan_digest(conn, recipient, today, now):
+    with conn:
+        subject, body = render_digest(cohort(conn, today), today)
+        return _queue(conn, "digest", recipient, today.isoformat(), recipient, subject, body, now)
+
+
+# ── SCHEDULER ─────────────────────────────────────────
+
+class FakeClock:
+    # frozen time that only moves on sleep(); for dry runs and tests
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Scheduler:
+    # queues due reminders and digests into the outbox, then drains it over the
+    # sender's single SMTP connection at no more than `rate` messages per second
+
+    def __init__(self, sender=None, facilitators=(), clock=time.time, sleep=time.sleep, rate=RATE,
+                 batch_size=BATCH_SIZE, interval=INTERVAL_SECONDS, repo=None):
+        self.facilitators = list(facilitators)
+        self.clock = clock
+        self.batch_size = batch_size
+        self.interval = interval
+        # claims in notifications and the outbox rows they queue must share one backend
+        self.repo = repo or repository.get()
+        self.worker = outbox.OutboxWorker(sender, clock=clock, rate=rate, sleep=sleep, repo=self.repo) \
+            if sender else None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def plan(self):
+        repo = self.repo
+        now = self.clock()
+        t = datetime.fromtimestamp(now)
+        counts = {"reminders": 0, "digests": 0}
+        if t.hour >= REMINDER_HOUR:
+            while True:
+                n = repo.write(_plan_reminders, t.date(), now, self.batch_size)
+                counts["reminders"] += n
+                if n < self.batch_size:
+                    break
+        if t.hour >= DIGEST_HOUR:
+            for recipient in self.facilitators:
+                if repo.write(_plan_digest, recipient, t.date(), now) is not None:
+                    counts["digests"] += 1
+        return counts
+
+    def send(self):
+        n = 0
+        while True:
+            batch = self.worker.drain_once()
+            if not batch:
+                return n
+            n += batch
+
+    def run_once(self):
+        counts = self.plan()
+        if self.worker:
+            counts["sent"] = self.send()
+        return counts
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                pass
+            self.stop_event.wait(self.interval)
+        if self.worker:
+            self.worker.sender.close()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="smu-scheduler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+
+if __name__ == "__main__":
+    # e.g. against a local stub: python -m aiosmtpd -n -l localhost:8025
+    #   python scheduler.py --host localhost --port 8025 --no-ssl --once --now 2026-03-02T19:00
+    ap = argparse.ArgumentParser(description="Queue and send daily logging reminders and facilitator digests.")
+    ap.add_argument("--host", default=os.environ.get("SMTP_HOST", "smtp.gmail.com"))
+    ap.add_argument("--port", type=int, default=int(os.environ.get("SMTP_PORT", 465)))
+    ap.add_argument("--no-ssl", action="store_true")
+    ap.add_argument("--facilitator", action="append", default=None,
+                    help="digest recipient, repeatable (default: $RECEIVER_EMAIL)")
+    ap.add_argument("--rate", type=float, default=RATE, help="max messages per second")
+    ap.add_argument("--interval", type=float, default=INTERVAL_SECONDS)
+    ap.add_argument("--once", action="store_true", help="one scan and send, then exit")
+    ap.add_argument("--now", default=None, help="pretend it is this local time (ISO); implies --once")
+    ap.add_argument("--plan-only", action="store_true", help="queue into the outbox without sending")
+    args = ap.parse_args()
+
+    facilitators = args.facilitator or [e for e in [os.environ.get("RECEIVER_EMAIL")] if e]
+    clock, sleep = time.time, time.sleep
+    if args.now:
+        clock = FakeClock(datetime.fromisoformat(args.now).timestamp())
+        sleep = clock.sleep
+    sender = None if args.plan_only else outbox.SMTPSender(
+        args.host, args.port, os.environ.get("EMAIL_ADDRESS"), os.environ.get("EMAIL_PASSWORD"),
+        ssl=not args.no_ssl)
+    scheduler = Scheduler(sender, facilitators, clock=clock, sleep=sleep, rate=args.rate, interval=args.interval)
+    if args.once or args.now:
+        print(scheduler.run_once())
+        if sender:
+            sender.close()
+    else:
+        scheduler.start()
+        try:
+            scheduler.thread.join()
+        except KeyboardInterrupt:
+            scheduler.stop()
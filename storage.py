@@ -0,0 +1,631 @@
+import sqlite3
+import json
+import os
+import sys
+import instrument
+import codec
+import anomaly
+from datetime import datetime
+
+DB_PATH = "smu.db"
+LEGACY_SOURCES = [("users.db", "t"), ("data.db", "users")]
+
+LOG_FIELDS = ["date", "duration", "apps", "trigger", "emotion_before", "emotion_after",
+              "reasons", "consequences", "trigger_when", "trigger_why", "trigger_felt"]
+PRETEST_FIELDS = ["daily_sm_min", "distractions", "sleep", "life_satisfaction",
+                  "focus", "coping", "spare_time", "goal_time"]
+DELTA_FIELDS = ["daily_sm_min", "distractions", "sleep", "life_satisfaction"]
+SUMMARY_FIELDS = ["progress", "log_count", "duration_sum", "duration_mean", "first_log_date", "last_log_date"] + \
+    ["delta_" + f for f in DELTA_FIELDS]
+POSTTEST_FIELDS = ["daily_sm_min", "distractions", "sleep", "life_satisfaction",
+                   "focus", "coping", "more_time"]
+DAY3_FIELDS = ["rules", "warning_signs", "recovery_plan", "support",
+               "what_changed", "what_worked", "what_hardest"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS participants (
+    id TEXT PRIMARY KEY,
+    progress INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    pending_events INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id TEXT NOT NULL REFERENCES participants(id),
+    date TEXT NOT NULL,
+    duration INTEGER,
+    apps TEXT,
+    "trigger" TEXT,
+    emotion_before TEXT,
+    emotion_after TEXT,
+    reasons TEXT,
+    consequences TEXT,
+    trigger_when TEXT,
+    trigger_why TEXT,
+    trigger_felt TEXT
+);
+CREATE INDEX IF NOT EXISTS logs_participant_date ON logs (participant_id, date);
+CREATE TABLE IF NOT EXISTS pretest (
+    participant_id TEXT PRIMARY KEY REFERENCES participants(id),
+    daily_sm_min INTEGER,
+    distractions INTEGER,
+    sleep INTEGER,
+    life_satisfaction INTEGER,
+    focus TEXT,
+    coping TEXT,
+    spare_time INTEGER,
+    goal_time INTEGER
+);
+CREATE TABLE IF NOT EXISTS posttest (
+    participant_id TEXT PRIMARY KEY REFERENCES participants(id),
+    daily_sm_min INTEGER,
+    distractions INTEGER,
+    sleep INTEGER,
+    life_satisfaction INTEGER,
+    focus TEXT,
+    coping TEXT,
+    more_time TEXT
+);
+CREATE TABLE IF NOT EXISTS day3 (
+    participant_id TEXT PRIMARY KEY REFERENCES participants(id),
+    rules TEXT,
+    warning_signs TEXT,
+    recovery_plan TEXT,
+    support TEXT,
+    what_changed TEXT,
+    what_worked TEXT,
+    what_hardest TEXT
+);
+CREATE TABLE IF NOT EXISTS participant_summary (
+    participant_id TEXT PRIMARY KEY REFERENCES participants(id),
+    progress INTEGER NOT NULL DEFAULT 0,
+    log_count INTEGER NOT NULL DEFAULT 0,
+    duration_sum INTEGER NOT NULL DEFAULT 0,
+    duration_mean REAL,
+    first_log_date TEXT,
+    last_log_date TEXT,
+    delta_daily_sm_min INTEGER,
+    delta_distractions INTEGER,
+    delta_sleep INTEGER,
+    delta_life_satisfaction INTEGER
+);
+CREATE INDEX IF NOT EXISTS summary_progress_last ON participant_summary (progress, last_log_date);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id TEXT NOT NULL REFERENCES participants(id),
+    payload BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_participant ON events (participant_id, id);
+CREATE TABLE IF NOT EXISTS snapshots (
+    participant_id TEXT NOT NULL REFERENCES participants(id),
+    last_event_id INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (participant_id, last_event_id)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id TEXT,
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    sent_at TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS usage_by_platform (
+    participant_id TEXT NOT NULL REFERENCES participants(id),
+    date TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    minutes REAL NOT NULL,
+    source TEXT,
+    imported_at TEXT NOT NULL,
+    PRIMARY KEY (participant_id, date, platform)
+);
+CREATE TABLE IF NOT EXISTS contacts (
+    participant_id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    due_date TEXT NOT NULL,
+    outbox_id INTEGER,
+    created_at TEXT NOT NULL,
+    UNIQUE (kind, target, due_date)
+);
+CREATE TABLE IF NOT EXISTS drafts (
+    participant_id TEXT NOT NULL,
+    form TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (participant_id, form)
+);
+CREATE TABLE IF NOT EXISTS audit_log (
+    seq INTEGER PRIMARY KEY,
+    at TEXT NOT NULL,
+    participant_id TEXT NOT NULL,
+    actor TEXT NOT NULL,
+    section TEXT NOT NULL,
+    version INTEGER,
+    fields TEXT NOT NULL,
+    old_hash TEXT,
+    new_hash TEXT,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS audit_participant ON audit_log (participant_id, seq);
+CREATE TABLE IF NOT EXISTS audit_head (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS participant_stats (
+    participant_id TEXT PRIMARY KEY REFERENCES participants(id),
+    log_count INTEGER NOT NULL DEFAULT 0,
+    ewma REAL,
+    ewm_var REAL NOT NULL DEFAULT 0,
+    last_date TEXT,
+    day_total INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,
+    max_streak INTEGER NOT NULL DEFAULT 0,
+    last_gap INTEGER NOT NULL DEFAULT 0,
+    max_gap INTEGER NOT NULL DEFAULT 0,
+    gaps INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relapse_flags (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id TEXT NOT NULL REFERENCES participants(id),
+    kind TEXT NOT NULL,
+    date TEXT NOT NULL,
+    value REAL,
+    baseline REAL,
+    created_at TEXT NOT NULL,
+    UNIQUE (participant_id, kind, date)
+);
+CREATE INDEX IF NOT EXISTS relapse_flags_date ON relapse_flags (date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# SQLite only: full-text index over the free-text trigger answers, kept in step with logs by triggers
+# (PostgreSQL gets a GIN expression index instead, see repository.PostgresRepository.init)
+SEARCH_FIELDS = ["trigger", "trigger_why", "trigger_felt"]
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+    "trigger", trigger_why, trigger_felt, content='logs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs BEGIN
+    INSERT INTO logs_fts (rowid, "trigger", trigger_why, trigger_felt)
+    VALUES (new.id, new."trigger", new.trigger_why, new.trigger_felt);
+END;
+CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs BEGIN
+    INSERT INTO logs_fts (logs_fts, rowid, "trigger", trigger_why, trigger_felt)
+    VALUES ('delete', old.id, old."trigger", old.trigger_why, old.trigger_felt);
+END;
+CREATE TRIGGER IF NOT EXISTS logs_fts_update AFTER UPDATE OF "trigger", trigger_why, trigger_felt ON logs BEGIN
+    INSERT INTO logs_fts (logs_fts, rowid, "trigger", trigger_why, trigger_felt)
+    VALUES ('delete', old.id, old."trigger", old.trigger_why, old.trigger_felt);
+    INSERT INTO logs_fts (rowid, "trigger", trigger_why, trigger_felt)
+    VALUES (new.id, new."trigger", new.trigger_why, new.trigger_felt);
+END;
+"""
+
+# SQLite only (trigger bodies contain ";"); PostgreSQL's equivalent is in repository.PostgresRepository.init
+AUDIT_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS audit_log_no_update BEFORE UPDATE ON audit_log
+BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS audit_log_no_delete BEFORE DELETE ON audit_log
+BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END;
+"""
+
+
+def search_vector(alias=""):
+    # PostgreSQL's counterpart of logs_fts; the query must repeat the indexed expression exactly
+    return "to_tsvector('simple', " + " || ' ' || ".join(
+        "coalesce(" + alias + _q(f) + ", '')" for f in SEARCH_FIELDS) + ")"
+
+
+def _q(name):
+    return '"' + name + '"'
+
+
+def _cols(fields):
+    return ", ".join(_q(f) for f in fields)
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _greatest(a, b):
+    # NULL-skipping two-way max that both SQLite and PostgreSQL accept
+    return "CASE WHEN %s IS NULL OR %s > %s THEN %s ELSE %s END" % (a, b, a, b, a)
+
+
+def stream(conn, sql, params=()):
+    # for reads consumed with fetchmany(): a server-side cursor on PostgreSQL, where a plain
+    # execute() loads the whole result first; SQLite already steps through rows lazily
+    return conn.stream(sql, params) if hasattr(conn, "stream") else conn.execute(sql, params)
+
+
+def _least(a, b):
+    return "CASE WHEN %s IS NULL OR %s < %s THEN %s ELSE %s END" % (a, b, a, b, a)
+
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value=excluded.value",
+                 (key, value))
+
+
+def _add_column(conn, table, column, decl):
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(" + table + ")")]
+    if column not in cols:
+        conn.execute("ALTER TABLE " + table + " ADD COLUMN " + column + " " + decl)
+
+
+def init(conn):
+    conn.executescript(SCHEMA)
+    _add_column(conn, "participants", "version", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "participants", "pending_events", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS participants_pending ON participants (pending_events)")
+    conn.executescript(AUDIT_TRIGGERS)
+    conn.commit()
+    init_fts(conn)
+    backfill(conn)
+
+
+def init_fts(conn):
+    try:
+        conn.executescript(FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        return False  # built without FTS5; logviewer falls back to LIKE
+    if not conn.execute("SELECT 1 FROM meta WHERE key='logs_fts_built'").fetchone():
+        # logs written before the index existed
+        with conn:
+            conn.execute("INSERT INTO logs_fts (logs_fts) VALUES ('rebuild')")
+            _set_meta(conn, "logs_fts_built", _now())
+    return True
+
+
+def has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name='logs_fts'").fetchone() is not None
+
+
+def backfill(conn):
+    # backend-neutral part of init(): derived tables for data written before they existed
+    if not conn.execute("SELECT 1 FROM meta WHERE key='summary_built'").fetchone():
+        rebuild_summary(conn)
+    if not conn.execute("SELECT 1 FROM meta WHERE key='stats_built'").fetchone():
+        anomaly.rebuild(conn)
+    if not conn.execute("SELECT 1 FROM meta WHERE key='lists_normalized'").fetchone():
+        normalize_lists(conn)
+    seed_snapshots(conn)
+
+
+def normalize_lists(conn):
+    # rewrite log lists stored in their str() form ("['Instagram', 'TikTok']") as JSON arrays
+    cols = _cols(codec.LIST_FIELDS)
+    n = 0
+    with conn:
+        rows = conn.execute("SELECT id, " + cols + " FROM logs").fetchall()
+        for row in rows:
+            values = [codec.list_text(v) for v in row[1:]]
+            if values != list(row[1:]):
+                conn.execute("UPDATE logs SET " + ", ".join(_q(f) + "=?" for f in codec.LIST_FIELDS) + " WHERE id=?",
+                             values + [row[0]])
+                n += 1
+        _set_meta(conn, "lists_normalized", _now())
+    return n
+
+
+def empty():
+    return {"progress": 0, "logs": [], "pretest": {}, "day2_logs": [], "day3": {}}
+
+
+def _row(conn, table, fields, uid):
+    row = conn.execute("SELECT " + _cols(fields) + " FROM " + table + " WHERE participant_id=?",
+                       (uid,)).fetchone()
+    return dict(zip(fields, row)) if row else {}
+
+
+def version(conn, uid):
+    row = conn.execute("SELECT version FROM participants WHERE id=?", (uid,)).fetchone()
+    return row[0] if row else 0
+
+
+def load(conn, uid):
+    return load_versioned(conn, uid)[0]
+
+
+def load_versioned(conn, uid):
+    row = conn.execute("SELECT progress, version FROM participants WHERE id=?", (uid,)).fetchone()
+    if not row:
+        return empty(), 0
+    d = empty()
+    d["progress"] = row[0]
+    cur = conn.execute("SELECT " + _cols(LOG_FIELDS) + " FROM logs WHERE participant_id=? ORDER BY date, id",
+                       (uid,))
+    d["logs"] = [_log_row(r) for r in cur]
+    d["pretest"] = _row(conn, "pretest", PRETEST_FIELDS, uid)
+    d["day3"] = _row(conn, "day3", DAY3_FIELDS, uid)
+    post = _row(conn, "posttest", POSTTEST_FIELDS, uid)
+    if post:
+        d["day3"]["posttest"] = post
+    return d, row[1]
+
+
+def _upsert(conn, table, fields, uid, values):
+    cols = ["participant_id"] + fields
+    conn.execute(
+        "INSERT INTO " + table + " (" + _cols(cols) + ") VALUES (" + ", ".join("?" * len(cols)) + ") "
+        "ON CONFLICT (participant_id) DO UPDATE SET " + ", ".join(_q(f) + "=excluded." + _q(f) for f in fields),
+        [uid] + [values.get(f) for f in fields])
+
+
+def _touch(conn, uid, progress, events=1):
+    now = _now()
+    conn.execute(
+        "INSERT INTO participants (id, progress, version, pending_events, created_at, updated_at) "
+        "VALUES (?, ?, 1, ?, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET progress=" + _greatest("participants.progress", "excluded.progress") + ", "
+        "version=participants.version+1, pending_events=participants.pending_events+excluded.pending_events, "
+        "updated_at=excluded.updated_at",
+        (uid, progress, events, now, now))
+
+
+def _insert_logs(conn, uid, logs):
+    conn.executemany(
+        "INSERT INTO logs (participant_id, " + _cols(LOG_FIELDS) + ") VALUES (?" + ", ?" * len(LOG_FIELDS) + ")",
+        [[uid] + [codec.list_text(log.get(f)) if f in codec.LIST_FIELDS else log.get(f) for f in LOG_FIELDS]
+         for log in logs])
+
+
+def _field(log, f):
+    # list fields are real lists in records; older callers sent their str() form
+    v = log.get(f)
+    return codec.parse_list(v) if f in codec.LIST_FIELDS else v
+
+
+def _log_row(row):
+    log = dict(zip(LOG_FIELDS, row))
+    for f in codec.LIST_FIELDS:
+        log[f] = codec.parse_list(log[f])
+    return log
+
+
+def submit(conn, uid, progress, log=None, pretest=None, day3=None, draft=None, before=None):
+    # draft: the form being submitted, whose saved draft goes in the same transaction;
+    # before: a dict that receives the previous values of what this overwrites (for audit.py)
+    with conn:
+        if draft is not None:
+            conn.execute("DELETE FROM drafts WHERE participant_id=? AND form=?", (uid, draft))
+        if before is not None:
+            before.update(previous(conn, uid, pretest is not None, day3 is not None))
+        _touch(conn, uid, progress)
+        if pretest is not None:
+            _upsert(conn, "pretest", PRETEST_FIELDS, uid, pretest)
+        if day3 is not None:
+            _upsert(conn, "day3", DAY3_FIELDS, uid, day3)
+            if day3.get("posttest"):
+                _upsert(conn, "posttest", POSTTEST_FIELDS, uid, day3["posttest"])
+        if log is not None:
+            _insert_logs(conn, uid, [log])
+            anomaly.observe(conn, uid, [log])
+        _update_summary(conn, uid, progress, [log] if log is not None else [],
+                        pretest is not None or day3 is not None)
+        _append_event(conn, uid, {"progress": progress, "log": log, "pretest": pretest, "day3": day3})
+    return version(conn, uid)
+
+
+def previous(conn, uid, pretest=False, day3=False):
+    row = conn.execute("SELECT progress FROM participants WHERE id=?", (uid,)).fetchone()
+    out = {"progress": row[0] if row else 0}
+    if pretest:
+        out["pretest"] = _row(conn, "pretest", PRETEST_FIELDS, uid) or None
+    if day3:
+        out["day3"] = _row(conn, "day3", DAY3_FIELDS, uid) or None
+        out["posttest"] = _row(conn, "posttest", POSTTEST_FIELDS, uid) or None
+    return out
+
+
+def add_logs(conn, uid, progress, logs):
+    # bulk form of submit() for imports: runs inside the caller's transaction, one event per log
+    _touch(conn, uid, progress, len(logs))
+    _insert_logs(conn, uid, logs)
+    anomaly.observe(conn, uid, logs)
+    _update_summary(conn, uid, progress, logs, False)
+    for log in logs:
+        _append_event(conn, uid, {"progress": progress, "log": log, "pretest": None, "day3": None})
+
+
+def logged_dates(conn, uid):
+    return {r[0][:10] for r in conn.execute("SELECT DISTINCT date FROM logs WHERE participant_id=?", (uid,))}
+
+
+def _append_event(conn, uid, payload):
+    blob = codec.encode_event(payload)
+    instrument.count("bytes_serialized", len(blob))
+    conn.execute("INSERT INTO events (participant_id, payload, created_at) VALUES (?, ?, ?)",
+                 (uid, blob, datetime.now().isoformat(timespec="microseconds")))
+
+
+def seed_snapshots(conn):
+    # participants whose data predates the event log get a baseline snapshot of their
+    # current state, positioned after any events they already have
+    missing = [r[0] for r in conn.execute(
+        "SELECT id FROM participants p WHERE NOT EXISTS (SELECT 1 FROM snapshots s WHERE s.participant_id = p.id)")]
+    if not missing:
+        return 0
+    for uid in missing:
+        with conn:
+            # the UPDATE comes first so its lock keeps concurrent saves out until the snapshot is in
+            conn.execute("UPDATE participants SET pending_events=0 WHERE id=?", (uid,))
+            last = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events WHERE participant_id=?", (uid,)).fetchone()[0]
+            conn.execute("INSERT INTO snapshots (participant_id, last_event_id, data, created_at) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT (participant_id, last_event_id) DO NOTHING",
+                         (uid, last, codec.encode_record(load(conn, uid)), _now()))
+    return len(missing)
+
+
+def apply(d, progress, log=None, pretest=None, day3=None):
+    # in-memory mirror of submit(), used to write through to cached records
+    d["progress"] = max(d["progress"], progress)
+    if pretest is not None:
+        d["pretest"] = {f: pretest.get(f) for f in PRETEST_FIELDS}
+    if day3 is not None:
+        post = d["day3"].get("posttest")
+        d["day3"] = {f: day3.get(f) for f in DAY3_FIELDS}
+        if day3.get("posttest"):
+            post = {f: day3["posttest"].get(f) for f in POSTTEST_FIELDS}
+        if post:
+            d["day3"]["posttest"] = post
+    if log is not None:
+        d["logs"].append({f: _field(log, f) for f in LOG_FIELDS})
+        d["logs"].sort(key=lambda r: r["date"])
+    return d
+
+
+# ── SUMMARY ───────────────────────────────────────────
+
+DELTAS_SQL = ", ".join(
+    "delta_%s=(SELECT post.%s - pre.%s FROM pretest pre JOIN posttest post USING (participant_id) "
+    "WHERE pre.participant_id=participant_summary.participant_id)" % (f, f, f) for f in DELTA_FIELDS)
+
+
+def _update_summary(conn, uid, progress, logs, tests_changed):
+    durations = [log.get("duration") or 0 for log in logs]
+    dates = [log["date"] for log in logs]
+    conn.execute(
+        "INSERT INTO participant_summary AS s (participant_id, progress, log_count, duration_sum, duration_mean, "
+        "first_log_date, last_log_date) VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (participant_id) DO UPDATE SET "
+        "progress=" + _greatest("s.progress", "excluded.progress") + ", "
+        "log_count=s.log_count+excluded.log_count, "
+        "duration_sum=s.duration_sum+excluded.duration_sum, "
+        "duration_mean=CAST(s.duration_sum+excluded.duration_sum AS REAL)/NULLIF(s.log_count+excluded.log_count, 0), "
+        "first_log_date=" + _least("s.first_log_date", "excluded.first_log_date") + ", "
+        "last_log_date=" + _greatest("s.last_log_date", "excluded.last_log_date"),
+        (uid, progress, len(logs), sum(durations), sum(durations) / len(logs) if logs else None,
+         min(dates) if dates else None, max(dates) if dates else None))
+    if tests_changed:
+        conn.execute("UPDATE participant_summary SET " + DELTAS_SQL + " WHERE participant_id=?", (uid,))
+
+
+def contact(conn, uid):
+    row = conn.execute("SELECT email FROM contacts WHERE participant_id=?", (uid,)).fetchone()
+    return row[0] if row else ""
+
+
+def set_contact(conn, uid, email):
+    # reminder address; an empty one opts out
+    with conn:
+        if email:
+            conn.execute("INSERT INTO contacts (participant_id, email, updated_at) VALUES (?, ?, ?) "
+                         "ON CONFLICT (participant_id) DO UPDATE SET email=excluded.email, "
+                         "updated_at=excluded.updated_at", (uid, email, _now()))
+        else:
+            conn.execute("DELETE FROM contacts WHERE participant_id=?", (uid,))
+
+
+def draft(conn, uid, form):
+    row = conn.execute("SELECT data FROM drafts WHERE participant_id=? AND form=?", (uid, form)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def save_draft(conn, uid, form, values):
+    with conn:
+        conn.execute("INSERT INTO drafts (participant_id, form, data, updated_at) VALUES (?, ?, ?, ?) "
+                     "ON CONFLICT (participant_id, form) DO UPDATE SET data=excluded.data, "
+                     "updated_at=excluded.updated_at", (uid, form, json.dumps(values), _now()))
+
+
+def summary(conn, uid):
+    row = conn.execute("SELECT " + _cols(SUMMARY_FIELDS) + " FROM participant_summary WHERE participant_id=?",
+                       (uid,)).fetchone()
+    if not row:
+        return {"progress": 0, "log_count": 0, "duration_sum": 0, "duration_mean": None,
+                "first_log_date": None, "last_log_date": None, **{"delta_" + f: None for f in DELTA_FIELDS}}
+    return dict(zip(SUMMARY_FIELDS, row))
+
+
+def rebuild_summary(conn):
+    # full backfill from the base tables; the app keeps the table current incrementally
+    with conn:
+        conn.execute("DELETE FROM participant_summary")
+        conn.execute(
+            "INSERT INTO participant_summary (participant_id, progress, log_count, duration_sum, duration_mean, "
+            "first_log_date, last_log_date) "
+            "SELECT p.id, p.progress, COUNT(l.id), COALESCE(SUM(COALESCE(l.duration, 0)), 0), "
+            "CAST(SUM(COALESCE(l.duration, 0)) AS REAL)/NULLIF(COUNT(l.id), 0), MIN(l.date), MAX(l.date) "
+            "FROM participants p LEFT JOIN logs l ON l.participant_id = p.id GROUP BY p.id")
+        conn.execute("UPDATE participant_summary SET " + DELTAS_SQL)
+        _set_meta(conn, "summary_built", _now())
+    return conn.execute("SELECT COUNT(*) FROM participant_summary").fetchone()[0]
+
+
+# ── LEGACY MIGRATION ──────────────────────────────────
+
+def import_record(conn, uid, d):
+    _touch(conn, uid, d.get("progress", 0))
+    if d.get("pretest"):
+        _upsert(conn, "pretest", PRETEST_FIELDS, uid, d["pretest"])
+    if d.get("day3"):
+        _upsert(conn, "day3", DAY3_FIELDS, uid, d["day3"])
+        if d["day3"].get("posttest"):
+            _upsert(conn, "posttest", POSTTEST_FIELDS, uid, d["day3"]["posttest"])
+    _insert_logs(conn, uid, d.get("logs", []))
+
+
+def migrate_legacy(conn, sources=None, force=False):
+    if not force and conn.execute("SELECT 1 FROM meta WHERE key='legacy_migrated'").fetchone():
+        return 0
+    n = 0
+    with conn:
+        for path, table in sources or LEGACY_SOURCES:
+            if not os.path.exists(path):
+                continue
+            src = sqlite3.connect(path)
+            try:
+                rows = src.execute("SELECT id, data FROM " + table).fetchall()
+            except sqlite3.OperationalError:
+                rows = []
+            finally:
+                src.close()
+            for uid, blob in rows:
+                if conn.execute("SELECT 1 FROM participants WHERE id=?", (uid,)).fetchone():
+                    continue
+                import_record(conn, uid, json.loads(blob))
+                n += 1
+        _set_meta(conn, "legacy_migrated", _now())
+    if n:
+        rebuild_summary(conn)
+        anomaly.rebuild(conn)
+        seed_snapshots(conn)
+    return n
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("migrate", "rebuild-summary"):
+        print("usage: python storage.py migrate [users.db:t data.db:users ...]\n"
+              "       python storage.py rebuild-summary")
+        sys.exit(2)
+    c = sqlite3.connect(os.environ.get("SMU_DB", DB_PATH))
+    init(c)
+    if sys.argv[1] == "migrate":
+        srcs = [tuple(a.split(":", 1)) for a in sys.argv[2:]] or None
+        print("migrated", migrate_legacy(c, srcs, force=True), "participants")
+    else:
+        print("rebuilt summary for", rebuild_summary(c), "participants")
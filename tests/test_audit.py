@@ -0,0 +1,46 @@
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import audit  # noqa: E402
+import ingest  # noqa: E402
+import repository  # noqa: E402
+
+
+def _repo(tmp_path):
+    return repository.SQLiteRepository(str(tmp_path / "smu.db"))
+
+
+def test_repeated_submit_is_audited(tmp_path):
+    repo = _repo(tmp_path)
+    repo.submit("A", 1, log={"date": "2026-01-01", "duration": 60})
+    repo.submit("A", 2, log={"date": "2026-01-02", "duration": 50})
+    repo.submit("A", 2)
+    repo.submit("A", 2)
+    repo.audit().flush()
+    r = audit.verify(repo.reader())
+    assert r["unaudited"] == []
+    assert r["broken_at"] is None and r["head_ok"]
+
+
+def test_reimport_is_audited(tmp_path):
+    repo = _repo(tmp_path)
+    csv = "date,app,minutes\n2026-01-01,Instagram,30\n2026-01-01,TikTok,15\n"
+    ingest.ingest("B", io.StringIO(csv), repo=repo)
+    version = repo.version("B")
+    ingest.ingest("B", io.StringIO(csv), repo=repo)
+    assert repo.version("B") == version
+    ingest.ingest("B", io.StringIO(csv.replace(",30", ",45")), repo=repo)
+    repo.audit().flush()
+    conn = repo.reader()
+    assert audit.verify(conn)["unaudited"] == []
+    usage = [e for e in audit.history(conn, "B") if e["section"] == "usage"]
+    assert json.loads(usage[-1]["fields"]) == ["2026-01-01 Instagram"]
+
+
+def test_import_without_matches_creates_nothing(tmp_path):
+    repo = _repo(tmp_path)
+    ingest.ingest("C", io.StringIO("date,app,minutes\n"), repo=repo)
+    assert repo.version("C") == 0